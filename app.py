@@ -1,81 +1,96 @@
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-import time
-import re
-from io import BytesIO
-
-def format_rupiah(x):
-    if pd.isna(x):
-        return ""
-    # pastikan bisa diubah ke float
-    try:
-        x = float(x)
-    except:
-        return x  # biarin apa adanya kalau bukan angka
-
-    # kalau tidak punya desimal (misal 7000.0), tampilkan tanpa ,00
-    if x.is_integer():
-        formatted = f"{int(x):,}".replace(",", ".")
-    else:
-        formatted = f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        # hapus ,00 kalau desimalnya 0 semua (misal 7000,00 → 7000)
-        if formatted.endswith(",00"):
-            formatted = formatted[:-3]
-    return formatted
-
-def highlight_total(row):
-    if any(str(x).strip().upper() == "TOTAL" for x in row):
-        return ["font-weight: bold; background-color: #D9EAD3; color: #1A5E20;"] * len(row)
-    else:
-        return [""] * len(row)
-    
-def highlight_bold(row):
-    if any(str(x).strip().upper() == "TOTAL" for x in row):
-        return ["font-weight: bold;"] * len(row)
-    else:
-        return [""] * len(row)
-    
-def highlight_rank_summary(row, num_cols):
-    styles = [""] * len(row)
-
-    # Ambil nilai numeric vendor
-    numeric_vals = row[num_cols]
-
-    # EXCLUDE nilai 0 (vendor tidak ikut tender)
-    numeric_vals = numeric_vals[numeric_vals != 0]
-
-    # Skip jika kosong / NaN semua
-    if numeric_vals.dropna().empty:
-        return styles
-
-    # Sort numeric values
-    sorted_vals = numeric_vals.sort_values()
-
-    # Determine 1st & 2nd rank
-    first_vendor = sorted_vals.index[0]
-    second_vendor = sorted_vals.index[1] if len(sorted_vals) > 1 else None
-
-    # Apply styles
-    for i, col in enumerate(row.index):
-        if col == first_vendor:
-            styles[i] = "background-color: #C6EFCE; color: #006100;"
-        elif second_vendor and col == second_vendor:
-            styles[i] = "background-color: #FFEB9C; color: #9C6500;"
-
-    return styles
-
-def highlight_1st_2nd(row, columns):
-    styles = [""] * len(columns)
-    first_vendor = row.get("1st Vendor")
-    second_vendor = row.get("2nd Vendor")
+from upl_comparison.cache import DEFAULT_MAX_BYTES, CachedComparison, ResultCache
+from upl_comparison.columnar import ColumnarStore
+from upl_comparison.charts import average_gap_chart, win_rate_chart
+from upl_comparison.diagnostics import Diagnostics
+from upl_comparison.export import CONDITIONAL, STATIC
+from upl_comparison.jobs import CANCELLED, FAILED, JobRunner, compare_job, workbook_job
+from upl_comparison.paging import DEFAULT_PAGE_SIZE, page_count, page_rows, select_rows
+from upl_comparison.pipeline import SHEETS, flag_totals
+from upl_comparison.ranking import rank_columns, rank_from_names
+from upl_comparison.styling import red_highlight, style_analysis, style_merge, style_transpose
+
+def paged_dataframe(df, style, key, page_size=DEFAULT_PAGE_SIZE):
+    # Tabel besar dipecah per halaman: filter & sort dikerjakan di server, lalu
+    # hanya baris di halaman yang terlihat yang di-style dan dikirim ke browser.
+    # style(view, rows) menerima potongan frame + posisi barisnya (untuk ranks)
+    rows = np.arange(len(df))
+    if len(df) > page_size:
+        col_filter, col_sort, col_order, col_page = st.columns([3, 2, 1, 1])
+        query = col_filter.text_input("Filter", key=f"{key}_filter", placeholder="Search text columns")
+        sort_by = col_sort.selectbox(
+            "Sort by", [None] + list(df.columns), key=f"{key}_sort",
+            format_func=lambda c: "-" if c is None else str(c),
+        )
+        ascending = col_order.selectbox("Order", ["Asc", "Desc"], key=f"{key}_order") == "Asc"
+        rows = select_rows(df, query, sort_by, ascending)
+
+        n_pages = page_count(len(rows), page_size)
+        if st.session_state.get(f"{key}_page", 1) > n_pages:
+            st.session_state[f"{key}_page"] = n_pages
+        page = col_page.number_input("Page", min_value=1, max_value=n_pages, key=f"{key}_page")
+        st.caption(f"{len(rows):,} rows | page {page} of {n_pages}")
+        rows = page_rows(rows, page, page_size)
+
+    # Styler dirender di dalam st.dataframe, jadi span-nya mencakup keduanya
+    with st.session_state.diagnostics.span(f"styling {key}", rows=len(rows)):
+        st.dataframe(style(df.iloc[rows], rows), hide_index=True)
+
+def chunked_dataframe(chunked, sheet, style, key, page_size=DEFAULT_PAGE_SIZE):
+    # Tender out-of-core (upl_comparison.chunked): tiap halaman dibaca langsung
+    # dari matrix di disk, tabel penuhnya tidak pernah dibuat, jadi filter &
+    # sort tidak tersedia. style(view) menerima baris halaman itu saja
+    n_rows = chunked.n_rows(sheet)
+    n_pages = page_count(n_rows, page_size)
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = n_pages
+    col_info, col_page = st.columns([6, 1])
+    page = col_page.number_input("Page", min_value=1, max_value=n_pages, key=f"{key}_page")
+    col_info.caption(
+        f"{n_rows:,} rows | page {page} of {n_pages} | "
+        "filter and sort are off for a tender this large"
+    )
 
-    for i, col in enumerate(columns):
-        if col == first_vendor:
-            styles[i] = "background-color: #C6EFCE; color: #006100;"
-        elif col == second_vendor:
-            styles[i] = "background-color: #FFEB9C; color: #9C6500;"
-    return styles
+    start = (page - 1) * page_size
+    view = chunked.rows(sheet, start, start + page_size)
+    with st.session_state.diagnostics.span(f"styling {key}", rows=len(view)):
+        st.dataframe(style(view), hide_index=True)
+
+@st.fragment(run_every=0.5)
+def job_progress(job, label):
+    # Dipolling tiap 0.5 detik tanpa menjalankan ulang seluruh halaman;
+    # begitu job selesai, halaman dijalankan ulang untuk mengambil hasilnya
+    if job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"{label}: {job.message}")
+    if st.button("Cancel", key=f"cancel_{job.key[0]}"):
+        job.cancel()
+        st.rerun()
+
+def job_result(job, label):
+    # Hasil job yang sudah selesai; selama belum, tampilkan progress dan
+    # kembalikan None. Job yang dibatalkan bisa dijalankan lagi; job yang
+    # gagal tetap tersimpan (tidak dicoba ulang tiap rerun) sampai Retry
+    # diklik, supaya satu error sementara tidak merusak sesi
+    if not job.done:
+        job_progress(job, label)
+        return None
+    if job.status == CANCELLED:
+        st.warning(f"{label}: cancelled.")
+        if st.button("Run again", key=f"rerun_{job.key[0]}"):
+            st.rerun()
+        return None
+    if job.status == FAILED:
+        st.error(f"{label}: failed. {job.message}")
+        st.exception(job.error)
+        if st.button("Retry", key=f"retry_{job.key[0]}"):
+            st.session_state.jobs.drop(job.key)
+            st.rerun()
+        return None
+    return job.result
 
 st.markdown(
     """
@@ -324,16 +339,9 @@ data = [
     ["Cross Connect", "Non-Services Area & Material", "Link", "29.800"],
     ["TOTAL", "", "", "33.400"],
 ]
-df = pd.DataFrame(data, columns=columns)
-
-def red_highlight(row):
-    if any(str(x).strip().upper() == "TOTAL" for x in row):
-        return [
-            "background-color: #FFE5E5; color: #D00000; font-weight: 700;"
-        ] * len(row)
-    return [""] * len(row)
+df = flag_totals(pd.DataFrame(data, columns=columns), [False, False, True])
 
-df_styled = df.style.apply(red_highlight, axis=1)
+df_styled = df.style.apply(red_highlight, axis=None)
 
 st.dataframe(df_styled, hide_index=True)
 
@@ -358,9 +366,42 @@ st.markdown("#### What is Displayed?")
 # Path file Excel yang sudah ada
 file_path = "dummy dataset.xlsx"
 
-# Buka file sebagai binary
-with open(file_path, "rb") as f:
-    file_data = f.read()
+# File dibaca sekali per proses & di-hash sekali per sesi; tiap tahap (parse, merge, transpose,
+# analysis, workbook) di-cache berdasarkan hash isi file
+# Setiap tahap yang benar-benar dihitung (bukan dari cache) dicatat di diagnostics.
+# File yang pernah diparse disimpan sebagai Arrow (.upl_cache/), jadi sesi
+# berikutnya tidak perlu membaca Excel-nya lagi
+# Cache & isi file dipakai bersama oleh semua sesi (st.cache_resource): N user
+# yang membuka tender yang sama cukup satu kali hitung dan satu salinan di memori.
+# Batasnya diatur lewat env UPL_CACHE_MAX_MB
+@st.cache_resource
+def shared_cache():
+    max_mb = os.environ.get("UPL_CACHE_MAX_MB")
+    return ResultCache(int(float(max_mb) * 2**20) if max_mb else DEFAULT_MAX_BYTES)
+
+@st.cache_resource
+def read_workbook(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+if "comparison" not in st.session_state:
+    st.session_state.diagnostics = Diagnostics()
+    st.session_state.comparison = CachedComparison(
+        read_workbook(file_path), shared_cache(), st.session_state.diagnostics, ColumnarStore()
+    )
+
+comparison = st.session_state.comparison
+file_data = comparison.data
+
+# Tahap berat (parse, cek constraint, merge, ranking) jalan di background;
+# hasilnya masuk ke cache sesi ini, jadi rerun berikutnya tinggal membaca.
+# Job untuk file lain (input berubah) dibatalkan
+if "jobs" not in st.session_state:
+    st.session_state.jobs = JobRunner()
+jobs = st.session_state.jobs
+compare_key = ("compare", comparison.key)
+jobs.cancel_stale(compare_key)
+compare = jobs.submit(compare_key, compare_job, comparison)
 
 # Markdown teks
 st.markdown(
@@ -387,6 +428,20 @@ st.download_button(
     use_container_width=True,
 )
 
+# Halaman berhenti di sini sampai perbandingan selesai
+violations = job_result(compare, "Comparing the workbook")
+if violations is None:
+    st.stop()
+
+# Aturan di bagian Constraint dicek dulu; workbook yang melanggar tidak diproses
+if not violations.empty:
+    st.error(
+        f"The workbook breaks the constraints above in {len(violations):,} place(s). "
+        "Fix every cell listed below and upload it again."
+    )
+    st.dataframe(violations, hide_index=True)
+    st.stop()
+
 st.markdown(
     """
     <div style="text-align: justify; font-size: 15px; margin-bottom: 20px">
@@ -408,34 +463,16 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# DataFrame
-columns = ["VENDOR", "Desc", "Category", "UoM", "Price (IDR)"]
-data = [
-    ["Vendor A", "Instalasi Optical Cable", "Non-Services Area & Material", "M", 3500],
-    ["Vendor A", "Cross connect", "Non-Services Area & Material", "Link", 30000],
-    ["Vendor A", "Dismantle RAU", "Non-Services Area & Material", "Pcs", 274500],
-    ["Vendor A", "TOTAL", "", "", 308000],
-
-    ["Vendor B", "Instalasi Optical Cable", "Non-Services Area & Material", "M", 3350],
-    ["Vendor B", "Cross connect", "Non-Services Area & Material", "Link", 30800],
-    ["Vendor B", "Dismantle RAU", "Non-Services Area & Material", "Pcs", 274200],
-    ["Vendor B", "TOTAL", "", "", 308350],
-
-    ["Vendor C", "Instalasi Optical Cable", "Non-Services Area & Material", "M", 3600],
-    ["Vendor C", "Cross connect", "Non-Services Area & Material", "Link", 29800],
-    ["Vendor C", "Dismantle RAU", "Non-Services Area & Material", "Pcs", 274450],
-    ["Vendor C", "TOTAL", "", "", 307850],
-]
-df_merge = pd.DataFrame(data, columns=columns)
-
-num_cols = ["Price (IDR)"]
-df_merge_styled = (
-    df_merge.style
-    .format({col: format_rupiah for col in num_cols})
-    .apply(highlight_total, axis=1)
-)
+# Tender yang sangat besar tidak dibuatkan tabel pandas-nya (lihat
+# CachedComparison.chunked): tiap halaman dibaca dari matrix di disk
+chunked = comparison.chunked()
 
-st.dataframe(df_merge_styled, hide_index=True)
+# DataFrame
+if chunked is None:
+    df_merge = comparison.merged()
+    paged_dataframe(df_merge, lambda view, rows: style_merge(view), key="merge")
+else:
+    chunked_dataframe(chunked, "Merge Data", style_merge, key="merge")
 
 st.write("")
 st.markdown("**:orange-badge[2. TRANSPOSE DATA]**")
@@ -461,23 +498,23 @@ st.markdown(
 )
 
 # DataFrame
-columns = ["Desc", "Category", "UoM", "Vendor A", "Vendor B", "Vendor C"]
-data = [
-    ["Corss connect", "Non-Services Area & Material", "Link", 30000, 30800, 29800],
-    ["Dismantle RAU", "Non-Services Area & Material", "Pcs", 274500, 274200, 274450],
-    ["Instalasi Optical Cable", "Non-Services Area & Material", "M", 3500, 3350, 3600],
-    ["TOTAL", "", "", 308000, 308350, 307850]
-]
-df_transpose = pd.DataFrame(data, columns=columns)
-
-num_cols = ["Vendor A", "Vendor B", "Vendor C"]
-df_transpose_styled = (
-    df_transpose.style
-    .format({col: format_rupiah for col in num_cols})
-    .apply(highlight_bold, axis=1)
-    .apply(lambda row: highlight_rank_summary(row, num_cols), axis=1)
-)
-st.dataframe(df_transpose_styled, hide_index=True)
+vendor_cols = comparison.vendors() if chunked is None else list(chunked.vendors)
+
+if chunked is None:
+    df_transpose = comparison.transposed()
+    ranks = comparison.ranks()
+    transpose_ranks = ranks["Transpose Data"]
+    paged_dataframe(
+        df_transpose,
+        lambda view, rows: style_transpose(view, vendor_cols, transpose_ranks[rows]),
+        key="transpose",
+    )
+else:
+    chunked_dataframe(
+        chunked, "Transpose Data",
+        lambda view: style_transpose(view, vendor_cols, rank_columns(view, vendor_cols)),
+        key="transpose",
+    )
 
 st.write("")
 st.markdown("**:yellow-badge[3. BID & PRICE ANALYSIS]**")
@@ -503,29 +540,20 @@ st.markdown(
 )
 
 # DataFrame
-columns = ["Desc", "Category", "UoM", "Vendor A", "Vendor B", "Vendor C", "1st Lowest", "1st Vendor", "2nd Lowest", "2nd Vendor", "Gap 1 to 2 (%)", "Median Price", "Vendor A to Median (%)", "Vendor B to Median (%)", "Vendor C to Median (%)"]
-data = [
-    ["Cross connect", "Non-Services Area & Material", "Link", 30000, 30800, 29800, 29800, "Vendor C", 30000, "Vendor A", 0.7, 30000, 0, 2.7, -0.7],
-    ["Dismantle RAU", "Non-Services Area & Material", "Pcs", 247500, 247200, 274450, 247200, "Vendor B", 274450, "Vendor C", 0.1, 274450, 0, -0.1, 0],
-    ["Instalasi Optical Cable", "Non-Services Area & Material", "M", 3500, 3350, 3600, 3350, "Vendor B", 3500, "Vendor A", 4.5, 3500, 0, -4.3, 2.9],
-]
-df_analysis = pd.DataFrame(data, columns=columns)
-
-num_cols = ["Vendor A", "Vendor B", "Vendor C", "1st Lowest", "2nd Lowest", "Median Price"]
-format_dic = {col: format_rupiah for col in num_cols}
-format_dic.update({"Gap 1 to 2 (%)": "{:.1f}%"})
-
-vendor_cols = ["Vendor A", "Vendor B", "Vendor C"]
-for v in vendor_cols:
-    format_dic[f"{v} to Median (%)"] = "{:+.1f}%"
-
-df_analysis_styled = (
-    df_analysis.style
-    .format(format_dic)
-    .apply(lambda row: highlight_1st_2nd(row, df_analysis.columns), axis=1)
-)
-
-st.dataframe(df_analysis_styled, hide_index=True)
+if chunked is None:
+    df_analysis = comparison.analysis()
+    analysis_ranks = ranks["Bid & Price Analysis"]
+    paged_dataframe(
+        df_analysis,
+        lambda view, rows: style_analysis(view, vendor_cols, analysis_ranks[rows]),
+        key="analysis",
+    )
+else:
+    chunked_dataframe(
+        chunked, "Bid & Price Analysis",
+        lambda view: style_analysis(view, vendor_cols, rank_from_names(view)),
+        key="analysis",
+    )
 
 st.write("")
 st.markdown("**:green-badge[4. VISUALIZATION]**")
@@ -543,8 +571,11 @@ st.markdown(
 
 tab1, tab2 = st.tabs(["Win Rate Trend", "Average Gap Trend"])
 
+# Chart dari counter per vendor (upl_comparison.aggregates), bukan scan ulang per item
+stats = comparison.stats()
+
 with tab1:
-    st.image("assets/1.png")
+    st.altair_chart(win_rate_chart(stats.win_rates()), use_container_width=True)
     with st.expander("See explanation"):
         st.caption('''
             The visualization above compares the win rate of each vendor
@@ -562,7 +593,11 @@ with tab1:
         ''')
 
 with tab2:
-    st.image("assets/2.png")
+    gaps, benchmark = stats.average_gaps()
+    st.altair_chart(average_gap_chart(gaps, benchmark), use_container_width=True)
+    # Tanpa gap sama sekali (misalnya hanya satu vendor) tidak ada benchmark
+    if not np.isfinite(benchmark):
+        st.caption("Not enough bids for a benchmark: no item has both a 1st and a 2nd lowest price.")
     with st.expander("See explanation"):
         st.caption('''
             The chart above shows the average price difference between 
@@ -576,7 +611,7 @@ with tab2:
             - Low Gap  
                 Low gap indicates intense competition with similar pricing among vendors.  
             
-            The dashed line represents the average gap across all vendors, serving as a benchmark (1.5%).
+            The dashed line represents the average gap across all vendors, serving as a benchmark.
         ''')
     
 st.write("")
@@ -594,148 +629,93 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-dataframes = {
-    "Merge Data": df_merge,
-    "Transpose Data": df_transpose,
-    "Bid & Price Analysis": df_analysis,
-}
-
 # Tampilkan multiselect
 selected_sheets = st.multiselect(
     "Select sheets to download in a single Excel file:",
-    options=list(dataframes.keys()),
-    default=list(dataframes.keys())  # default semua dipilih
+    options=list(SHEETS),
+    default=list(SHEETS)  # default semua dipilih
 )
 
-# Fungsi "Super Button" & Formatting
-def generate_multi_sheet_excel(selected_sheets, df_dict):
-    output = BytesIO()
-
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        for sheet in selected_sheets:
-            df = df_dict[sheet]
-            df.to_excel(writer, index=False, sheet_name=sheet)
-
-            workbook  = writer.book
-            worksheet = writer.sheets[sheet]
-
-            # ===== FORMAT =====
-            fmt_rp   = workbook.add_format({'num_format': '#,##0'})
-            fmt_pct  = workbook.add_format({'num_format': '#,##0.0"%"'})
-            fmt_bold = workbook.add_format({'bold': True, 'num_format': '#,##0'})
-
-            fmt_total = workbook.add_format({
-                'bold': True,
-                'bg_color': '#D9EAD3',
-                'font_color': '#1A5E20',
-                'num_format': '#,##0'
-            })
-
-            fmt_1 = workbook.add_format({
-                'bg_color': '#C6EFCE',
-                'num_format': '#,##0'
-            })
-
-            fmt_2 = workbook.add_format({
-                'bg_color': '#FFEB9C',
-                'num_format': '#,##0'
-            })
-
-            fmt_1b = workbook.add_format({
-                'bg_color': '#C6EFCE',
-                'bold': True,
-                'num_format': '#,##0'
-            })
-
-            fmt_2b = workbook.add_format({
-                'bg_color': '#FFEB9C',
-                'bold': True,
-                'num_format': '#,##0'
-            })
-
-            num_cols = df.select_dtypes(include=["number"]).columns.tolist()
-            pct_cols = [c for c in df.columns if "%" in c]
-
-            # ===== LOOP DATA =====
-            for r, (_, row) in enumerate(df.iterrows(), start=1):
-                is_total = any(str(x).strip().upper() == "TOTAL" for x in row)
-
-                first = second = None
-
-                # ===== SUMMARY RANKING (EXCLUDE ZERO) =====
-                if sheet == "Transpose Data":
-                    numeric_vals = row[num_cols]
-                    numeric_vals = numeric_vals[
-                        (numeric_vals.notna()) & (numeric_vals != 0)
-                    ]
-
-                    if not numeric_vals.empty:
-                        sorted_vals = numeric_vals.sort_values()
-                        first = sorted_vals.index[0]
-                        if len(sorted_vals) > 1:
-                            second = sorted_vals.index[1]
-
-                # ===== BID & PRICE =====
-                if sheet == "Bid & Price Analysis":
-                    first = row.get("1st Vendor")
-                    second = row.get("2nd Vendor")
-
-                for c, col in enumerate(df.columns):
-                    val = row[col]
-
-                    # ===== SAFETY =====
-                    if pd.isna(val) or (isinstance(val, (int, float)) and np.isinf(val)):
-                        worksheet.write(r, c, "")
-                        continue
-
-                    fmt = None
-
-                    is_zero = isinstance(val, (int, float)) and val == 0
-                    # ===== NO HIGHLIGHT FOR ZERO (EXCEPT MERGE DATA) =====
-                    if is_zero and sheet != "Merge Data":
-                        fmt = None
-
-                    # ===== PICK FORMAT =====
-                    elif col == first:
-                        fmt = fmt_1b if is_total else fmt_1
-                    elif col == second:
-                        fmt = fmt_2b if is_total else fmt_2
-                    elif is_total and sheet == "Merge Data":
-                        fmt = fmt_total
-                    elif is_total:
-                        fmt = fmt_bold
-
-                    # ===== WRITE CELL =====
-                    if col in pct_cols:
-                        worksheet.write_number(r, c, val, fmt or fmt_pct)
-                    elif col in num_cols:
-                        worksheet.write_number(r, c, val, fmt or fmt_rp)
-                    else:
-                        worksheet.write(r, c, val, fmt)
-
-                # ===== AUTOFIT =====
-                for i, col in enumerate(df.columns):
-                    worksheet.set_column(
-                        i, i,
-                        max(len(str(col)), df[col].astype(str).map(len).max()) + 2
-                    )
-
-    output.seek(0)
-    return output.getvalue()
+# Conditional formatting: highlight dihitung Excel sendiri, file lebih ringan
+highlight = CONDITIONAL if st.toggle(
+    "Conditional formatting",
+    help="Highlight the TOTAL rows and the 1st / 2nd lowest prices with Excel rules instead of fixed cell colors.",
+) else STATIC
 
 # ---- DOWNLOAD BUTTON ----
+# Workbook baru dibuat (di background) setelah tombol Prepare diklik, bukan di
+# setiap rerun; job untuk pilihan sheet / format lama dibatalkan, dan pilihan
+# yang sama tidak dibuat ulang
+workbook = None
 if selected_sheets:
-    excel_bytes = generate_multi_sheet_excel(selected_sheets, dataframes)
-
+    workbook_key = ("workbook", comparison.key, tuple(selected_sheets), highlight)
+    jobs.cancel_stale(workbook_key)
+    export_job = jobs.get(workbook_key)
+    if export_job is None or export_job.status == CANCELLED:
+        export_job = None
+        if st.button("Prepare Excel", type="primary", use_container_width=True):
+            export_job = jobs.submit(workbook_key, workbook_job, comparison, selected_sheets, highlight)
+    if export_job is not None:
+        workbook = job_result(export_job, "Preparing the Excel file")
+
+if workbook is not None:
+    # Tender yang sangat besar datang sebagai file sementara (bukan bytes);
+    # isinya baru dibaca saat tombol Download diklik
+    if hasattr(workbook, "read"):
+        def workbook_data(workbook=workbook):
+            workbook.seek(0)
+            return workbook.read()
+    else:
+        workbook_data = workbook
     st.download_button(
         label="Download",
-        data=excel_bytes,
+        data=workbook_data,
         file_name="Super Botton - UPL Comparison.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         type="primary",
         use_container_width=True,
     )
-        
+
+# ---- DIAGNOSTICS ----
+# Waktu, jumlah baris & puncak memori per tahap, untuk dilampirkan ke tiket
+diagnostics = st.session_state.diagnostics
+with st.expander("Diagnostics"):
+    # tracemalloc memperlambat tiap tahap beberapa kali lipat, jadi hanya
+    # dinyalakan kalau memang sedang menyelidiki memori
+    diagnostics.trace_memory = st.toggle(
+        "Trace memory",
+        value=diagnostics.trace_memory,
+        help="Record the peak memory of every stage computed from now on. "
+             "Makes the stages several times slower; the peak is left empty for "
+             "stages that ran at the same time as another traced stage.",
+    )
+    spans = diagnostics.frame()
+    if spans.empty:
+        st.caption("No stage recorded yet.")
+    else:
+        st.caption("Stages served from the cache are not recorded; seconds include the nested stages.")
+        st.dataframe(spans, hide_index=True)
+    cache_stats = shared_cache().stats()
+    hit_rate = "-" if cache_stats["hit_rate"] is None else f"{cache_stats['hit_rate']:.0%}"
+    st.caption(
+        f"Shared cache: {cache_stats['entries']} entries, "
+        f"{cache_stats['bytes'] / 2**20:,.1f} / {cache_stats['max_bytes'] / 2**20:,.0f} MB | "
+        f"hit rate {hit_rate} ({cache_stats['hits']} hits, {cache_stats['waits']} waits, "
+        f"{cache_stats['misses']} misses, {cache_stats['evictions']} evictions, "
+        f"{cache_stats['refused']} refused as over the budget)"
+    )
+    col_json, col_clear = st.columns([3, 1])
+    col_json.download_button(
+        label="Export JSON",
+        data=diagnostics.to_json(workbook=comparison.key, file_name=file_path, cache=cache_stats),
+        file_name="Diagnostics - UPL Comparison.json",
+        mime="application/json",
+        use_container_width=True,
+    )
+    if col_clear.button("Clear", use_container_width=True):
+        diagnostics.clear()
+        st.rerun()
+
 st.write("")
 st.divider()
 
@@ -0,0 +1,45 @@
+"""Bid & Price Analysis benchmark: analyze_prices on a full items x vendors matrix.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analysis --items 100000 --vendors 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from upl_comparison.pipeline import analyze_prices
+
+
+def make_prices(n_items, n_vendors, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = rng.integers(1_000, 500_000, size=(n_items, n_vendors)).astype(float)
+    prices[rng.random(prices.shape) < 0.05] = 0  # did not bid
+    prices[rng.random(prices.shape) < 0.05] = np.nan  # item not in the sheet
+    return prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--vendors", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    prices = make_prices(args.items, args.vendors)
+    vendors = [f"Vendor {i + 1}" for i in range(args.vendors)]
+
+    print(f"{'dtype':>8} {'best (s)':>10} {'MB out':>8}")
+    for dtype in (np.float64, np.float32):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            analysis = analyze_prices(prices, vendors, dtype=dtype)
+            best = min(best, time.perf_counter() - start)
+        size = analysis.memory_usage(deep=False).sum() / 1e6
+        print(f"{np.dtype(dtype).name:>8} {best:>10.3f} {size:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
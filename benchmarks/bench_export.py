@@ -0,0 +1,60 @@
+"""Super Button export benchmark: how generate_multi_sheet_excel scales with rows and vendors.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_export --rows 1000 5000 20000 --vendors 3 15
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from upl_comparison.export import generate_multi_sheet_excel
+from upl_comparison.matrix import PriceMatrix
+
+
+def make_frames(n_rows, n_vendors, seed=0):
+    rng = np.random.default_rng(seed)
+    vendors = [f"Vendor {i + 1}" for i in range(n_vendors)]
+
+    prices = rng.integers(1_000, 500_000, size=(n_rows, n_vendors)).astype(float)
+    prices[rng.random(prices.shape) < 0.05] = 0  # did not bid
+
+    items = pd.DataFrame({
+        "Desc": [f"Item {i}" for i in range(n_rows)],
+        "Category": rng.choice(["Services", "Non-Services Area & Material"], n_rows),
+        "UoM": rng.choice(["M", "Link", "Pcs", "Lot"], n_rows),
+    })
+
+    matrix = PriceMatrix.from_frames({v: items.assign(**{"Price (IDR)": prices[:, i]}) for i, v in enumerate(vendors)})
+    return {"Merge Data": matrix.merged(), "Transpose Data": matrix.transposed()}
+
+
+def run(rows, vendors, repeat):
+    print(f"{'rows':>8} {'vendors':>8} {'cells':>10} {'best (s)':>10} {'us/cell':>8}")
+    for n_vendors in vendors:
+        for n_rows in rows:
+            frames = make_frames(n_rows, n_vendors)
+            cells = sum(df.size for df in frames.values())
+
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                generate_multi_sheet_excel(list(frames), frames)
+                best = min(best, time.perf_counter() - start)
+
+            print(f"{n_rows:>8} {n_vendors:>8} {cells:>10} {best:>10.3f} {best / cells * 1e6:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--vendors", type=int, nargs="+", default=[3, 15])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.vendors, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
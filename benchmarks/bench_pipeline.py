@@ -0,0 +1,227 @@
+"""Stage-by-stage pipeline benchmark with stored baselines.
+
+Times every stage (ingest, merge, transpose, analysis, ranking, styling,
+export) on seeded synthetic workbooks, records its peak traced memory and
+compares both against benchmarks/baselines.json. Times are stored and gated
+as multiples of a fixed reference workload timed right before every run of
+the stage, so the baselines carry over between machines and a machine
+slowed down during the run slows both alike; peak memory is gated as it is.
+The exit status is 1 when a stage regressed past the tolerance, so the
+script can gate CI; benchmarks/test_bench_pipeline.py runs the same gate
+under pytest. Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --preset small medium
+    python -m benchmarks.bench_pipeline --items 20000 --vendors 10 --zero-share 0.3 --max-offset 0
+    python -m benchmarks.bench_pipeline --preset medium --save-baseline
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.workbooks import make_workbook
+from upl_comparison.export import generate_multi_sheet_excel
+from upl_comparison.ingest import read_vendor_workbook
+from upl_comparison.matrix import PriceMatrix
+from upl_comparison.paging import DEFAULT_PAGE_SIZE
+from upl_comparison.pipeline import SHEETS
+from upl_comparison.ranking import rank_columns, rank_from_names
+from upl_comparison.styling import style_analysis, style_merge, style_transpose
+
+BASELINES = Path(__file__).with_name("baselines.json")
+
+# Absolute slack on top of the relative tolerance: millisecond stages jitter
+MIN_SECONDS = 0.01
+MIN_MB = 0.5
+
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.10
+
+# (items, vendors); every vendor is one sheet
+PRESETS = {
+    "small": (500, 5),
+    "medium": (5_000, 20),
+    "large": (20_000, 40),
+}
+ZERO_SHARE = 0.05
+MAX_OFFSET = 5
+
+
+def workbook_name(n_items, n_vendors, zero_share=ZERO_SHARE, max_offset=MAX_OFFSET, seed=0):
+    # Baselines are stored per workbook shape, so a custom size is gated
+    # once a baseline was saved for it
+    return f"{n_items}x{n_vendors} zero={zero_share:g} offset={max_offset} seed={seed}"
+
+
+def reference_workload():
+    """A fixed numpy / pandas / pure Python workload; returns the function timing one run of it."""
+    rng = np.random.default_rng(0)
+    values = rng.random(1_000_000)
+    labels = pd.Series(rng.integers(0, 50_000, 300_000)).astype(str)
+
+    def timed():
+        start = time.perf_counter()
+        np.sort(values)
+        pd.factorize(labels)
+        sum(len(str(i)) for i in range(300_000))
+        return time.perf_counter() - start
+
+    return timed
+
+
+def stages(data):
+    # Stage functions in pipeline order; each receives the results so far
+    page = slice(0, DEFAULT_PAGE_SIZE)
+
+    def ingest(r):
+        return read_vendor_workbook(data)
+
+    def merge(r):
+        matrix = PriceMatrix.from_frames(r["ingest"])
+        return matrix, matrix.merged()
+
+    def transpose(r):
+        return r["merge"][0].transposed()
+
+    def analysis(r):
+        return r["merge"][0].analysis()
+
+    def ranking(r):
+        vendors = list(r["merge"][0].vendors)
+        return rank_columns(r["transpose"], vendors), rank_from_names(r["analysis"])
+
+    def styling(r):
+        # What the page renders: the first page of each table
+        vendors = list(r["merge"][0].vendors)
+        transpose_ranks, analysis_ranks = r["ranking"]
+        return [
+            style_merge(r["merge"][1].iloc[page]).to_html(),
+            style_transpose(r["transpose"].iloc[page], vendors, transpose_ranks[page]).to_html(),
+            style_analysis(r["analysis"].iloc[page], vendors, analysis_ranks[page]).to_html(),
+        ]
+
+    def export(r):
+        sheets = dict(zip(SHEETS, (r["merge"][1], r["transpose"], r["analysis"])))
+        ranks = dict(zip(SHEETS[1:], r["ranking"]))
+        return generate_multi_sheet_excel(list(SHEETS), sheets, ranks=ranks)
+
+    return [ingest, merge, transpose, analysis, ranking, styling, export]
+
+
+def measure(data, repeat, reference):
+    # Every timed run of a stage follows a run of the reference workload;
+    # the stage's ratio is the best of stage / reference over the repeats,
+    # so a slowdown of the machine during the run cancels out
+    results, report = {}, {}
+    for stage in stages(data):
+        best, ratio = float("inf"), float("inf")
+        for _ in range(repeat):
+            unit = reference()
+            start = time.perf_counter()
+            value = stage(results)
+            seconds = time.perf_counter() - start
+            best, ratio = min(best, seconds), min(ratio, seconds / unit)
+
+        # Separate traced run: tracemalloc slows the stage down
+        tracemalloc.start()
+        stage(results)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[stage.__name__] = value
+        report[stage.__name__] = {
+            "seconds": round(best, 4),
+            "ratio": round(ratio, 3),
+            "peak_mb": round(peak / 2**20, 2),
+        }
+    return report
+
+
+def compare(report, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    # Stages slower / hungrier than baseline * (1 + tolerance); MIN_SECONDS
+    # of slack are converted to a ratio at this stage's own speed
+    failures = []
+    for stage, now in report.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        slack = MIN_SECONDS * now["ratio"] / now["seconds"] if now["seconds"] else 0.0
+        if now["ratio"] > base["ratio"] * (1 + time_tolerance) + slack:
+            failures.append(f"{stage}: {now['ratio']:.2f}x reference vs baseline {base['ratio']:.2f}x")
+        if now["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance) + MIN_MB:
+            failures.append(f"{stage}: {now['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return failures
+
+
+def load_baselines(path=BASELINES):
+    path = Path(path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", nargs="+", choices=list(PRESETS), default=None)
+    parser.add_argument("--items", type=int, help="items per vendor sheet (instead of --preset)")
+    parser.add_argument("--vendors", type=int, help="vendor sheets per workbook (instead of --preset)")
+    parser.add_argument("--zero-share", type=float, default=ZERO_SHARE, help="share of 0 (did not bid) prices")
+    parser.add_argument("--max-offset", type=int, default=MAX_OFFSET,
+                        help="largest row / column offset of the floating tables (0 = at A1)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--baselines", default=BASELINES, help="baseline file (default: benchmarks/baselines.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    if (args.items is None) != (args.vendors is None):
+        parser.error("--items and --vendors go together")
+    if args.items is not None:
+        if args.preset:
+            parser.error("give either --preset or --items / --vendors")
+        sizes = [(args.items, args.vendors)]
+    else:
+        sizes = [PRESETS[preset] for preset in args.preset or ["small", "medium"]]
+
+    baselines = load_baselines(args.baselines)
+    reference = reference_workload()
+    print(f"reference workload: {min(reference() for _ in range(args.repeat)):.3f} s")
+
+    failures = []
+    for n_items, n_vendors in sizes:
+        name = workbook_name(n_items, n_vendors, args.zero_share, args.max_offset, args.seed)
+        data = make_workbook(n_items, n_vendors, seed=args.seed, zero_share=args.zero_share, max_offset=args.max_offset)
+        report = measure(data, args.repeat, reference)
+
+        baseline = baselines.get(name, {})
+        print(f"\n{name}" + ("" if baseline or args.save_baseline else " (no baseline)"))
+        print(f"{'stage':>10} {'best (s)':>10} {'x ref':>8} {'base x':>8} {'peak MB':>9} {'base MB':>9}")
+        for stage, now in report.items():
+            base = baseline.get(stage, {})
+            print(
+                f"{stage:>10} {now['seconds']:>10.3f} {now['ratio']:>8.2f} {base.get('ratio', float('nan')):>8.2f}"
+                f" {now['peak_mb']:>9.1f} {base.get('peak_mb', float('nan')):>9.1f}"
+            )
+
+        if args.save_baseline:
+            baselines[name] = {stage: {"ratio": now["ratio"], "peak_mb": now["peak_mb"]} for stage, now in report.items()}
+        else:
+            failures += [
+                f"[{name}] {f}" for f in compare(report, baseline, args.time_tolerance, args.memory_tolerance)
+            ]
+
+    if args.save_baseline:
+        Path(args.baselines).write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\nbaseline saved to {args.baselines}")
+    elif failures:
+        print("\nREGRESSIONS:\n" + "\n".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
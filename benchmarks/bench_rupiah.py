@@ -0,0 +1,53 @@
+"""Rupiah formatter microbenchmark: per-cell format_rupiah vs. format_rupiah_array.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rupiah --rows 20000 --vendors 15
+"""
+import argparse
+import time
+
+import numpy as np
+
+from upl_comparison.formatting import format_rupiah, format_rupiah_array
+
+
+def make_prices(n_rows, n_vendors, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = rng.integers(1_000, 50_000_000, size=(n_rows, n_vendors)).astype(float)
+    decimals = rng.random(prices.shape) < 0.3
+    prices[decimals] += rng.integers(1, 100, decimals.sum()) / 100
+    prices[rng.random(prices.shape) < 0.05] = np.nan
+    return prices
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--vendors", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    prices = make_prices(args.rows, args.vendors)
+    columns = [prices[:, j] for j in range(prices.shape[1])]
+
+    t_cell, expected = best_of(lambda: [[format_rupiah(v) for v in col] for col in columns], args.repeat)
+    t_array, got = best_of(lambda: [format_rupiah_array(col).tolist() for col in columns], args.repeat)
+    assert got == expected, "format_rupiah_array differs from format_rupiah"
+
+    print(f"cells:               {prices.size}")
+    print(f"format_rupiah:       {t_cell:.3f} s")
+    print(f"format_rupiah_array: {t_array:.3f} s  ({t_cell / t_array:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""The pipeline benchmark as a test suite: one test per stage of the small preset.
+
+Collected with the other tests (``python -m pytest`` from the repository
+root); each stage is gated by bench_pipeline.compare against its stored
+baseline, the larger presets stay with the command line.
+"""
+import pytest
+
+from benchmarks.bench_pipeline import PRESETS, compare, load_baselines, measure, reference_workload, stages, workbook_name
+from benchmarks.workbooks import make_workbook
+
+PRESET = "small"
+
+
+@pytest.fixture(scope="module")
+def run():
+    return measure(make_workbook(*PRESETS[PRESET]), repeat=3, reference=reference_workload())
+
+
+@pytest.mark.parametrize("stage", [stage.__name__ for stage in stages(None)])
+def test_stage_within_baseline(run, stage):
+    report = run
+    baseline = load_baselines().get(workbook_name(*PRESETS[PRESET]), {})
+    if stage not in baseline:
+        pytest.skip(f"no baseline for {stage}")
+    assert compare({stage: report[stage]}, baseline) == []
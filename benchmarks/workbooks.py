@@ -0,0 +1,37 @@
+"""Seeded synthetic vendor workbooks for the benchmarks.
+
+One sheet per vendor, each holding a floating table at a random offset:
+item columns (Desc, Category, UoM) followed by the PRICE column, with a share
+of zero ("did not bid") prices.
+"""
+from io import BytesIO
+
+import numpy as np
+import xlsxwriter
+
+CATEGORIES = ["Services", "Non-Services Area & Material", "Civil Work", "Transport"]
+UOMS = ["M", "Link", "Pcs", "Lot", "Unit"]
+
+
+def make_workbook(n_items, n_vendors, seed=0, zero_share=0.05, max_offset=5):
+    """xlsx bytes of ``n_vendors`` sheets with ``n_items`` rows each."""
+    rng = np.random.default_rng(seed)
+    desc = [f"Item {i:06d}" for i in range(n_items)]
+    category = rng.choice(CATEGORIES, n_items).tolist()
+    uom = rng.choice(UOMS, n_items).tolist()
+
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
+    for v in range(n_vendors):
+        worksheet = workbook.add_worksheet(f"Vendor {v + 1}")
+        row0, col0 = rng.integers(0, max_offset + 1, size=2).tolist()
+
+        prices = rng.integers(1_000, 500_000, size=n_items).astype(float)
+        prices[rng.random(n_items) < zero_share] = 0
+
+        worksheet.write_row(row0, col0, ["Desc", "Category", "UoM", "PRICE"])
+        for i, values in enumerate(zip(desc, category, uom, prices.tolist())):
+            worksheet.write_row(row0 + 1 + i, col0, values)
+    workbook.close()
+
+    return output.getvalue()
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from upl_comparison.matching import FUZZY
+from upl_comparison.matrix import PriceMatrix
+from upl_comparison.pipeline import VENDOR
+
+COLUMNS = ["Desc", "Category", "UoM", "PRICE"]
+
+
+def sheet(rows):
+    return pd.DataFrame(rows, columns=COLUMNS).astype({c: "category" for c in COLUMNS[:-1]})
+
+
+def prices(matrix):
+    # {(desc, vendor): price} of every priced cell
+    table = matrix.transposed().reset_index(drop=True).iloc[:-1]
+    return {
+        (desc, vendor): price
+        for desc, row in zip(table["Desc"], table[list(matrix.vendors)].to_numpy())
+        for vendor, price in zip(matrix.vendors, row)
+        if not np.isnan(price)
+    }
+
+
+def test_fuzzy_folds_typos_across_sheets():
+    matrix = PriceMatrix.from_frames(
+        {
+            "A": sheet([["Cross connect", "NS", "Link", 1.0]]),
+            "B": sheet([["Corss connect", "NS", "Link", 1.5]]),
+        },
+        match=FUZZY,
+    )
+    assert prices(matrix) == {("Cross connect", "A"): 1.0, ("Cross connect", "B"): 1.5}
+
+
+def test_fuzzy_keeps_near_duplicates_of_one_sheet_apart():
+    rows = [
+        ["Dismantle RAU", "NS", "Unit", 1000.0],
+        ["Dismantle RRU", "NS", "Unit", 2000.0],
+        ["Install pole", "NS", "Pcs", 300.0],
+        ["Uninstall pole", "NS", "Pcs", 400.0],
+    ]
+    matrix = PriceMatrix.from_frames({"A": sheet(rows), "B": sheet(rows[::-1])}, match=FUZZY)
+
+    assert matrix.n_items == 4
+    assert prices(matrix) == {(desc, vendor): price for desc, _, _, price in rows for vendor in "AB"}
+    merged = matrix.merged()
+    assert set(merged.loc[merged[VENDOR] == "A", "Desc"]) >= {"Dismantle RAU", "Dismantle RRU"}
+
+
+def test_fuzzy_skips_a_sheet_with_two_candidates():
+    matrix = PriceMatrix.from_frames(
+        {
+            "A": sheet([["Cross connect", "NS", "Link", 1.0]]),
+            "B": sheet([["Corss connect", "NS", "Link", 1.5], ["Cross conect", "NS", "Link", 1.7]]),
+        },
+        match=FUZZY,
+    )
+    assert matrix.n_items == 3
+
+
+def test_fuzzy_compares_model_tokens_exactly():
+    matrix = PriceMatrix.from_frames(
+        {
+            "A": sheet([["Dismantle RAU", "NS", "Unit", 1000.0]]),
+            "B": sheet([["Dismantle RRU", "NS", "Unit", 2000.0]]),
+        },
+        match=FUZZY,
+    )
+    assert matrix.n_items == 2
@@ -0,0 +1,43 @@
+"""Computation core of the UPL Comparison menu.
+
+Importing the package is free of side effects and loads nothing heavy:
+pandas, numpy and xlsxwriter are only imported when one of the names below
+(or a submodule) is first used.
+"""
+import importlib
+
+_EXPORTS = {
+    "CachedComparison": "upl_comparison.cache",
+    "ChunkedMatrix": "upl_comparison.chunked",
+    "ColumnarStore": "upl_comparison.columnar",
+    "Diagnostics": "upl_comparison.diagnostics",
+    "HistoryStore": "upl_comparison.store",
+    "IncrementalComparison": "upl_comparison.incremental",
+    "InvalidWorkbook": "upl_comparison.validation",
+    "JobRunner": "upl_comparison.jobs",
+    "PriceMatrix": "upl_comparison.matrix",
+    "ResultCache": "upl_comparison.cache",
+    "VendorStats": "upl_comparison.aggregates",
+    "analyze_prices": "upl_comparison.pipeline",
+    "generate_multi_sheet_excel": "upl_comparison.export",
+    "read_vendor_tables": "upl_comparison.ingest",
+    "read_vendor_workbook": "upl_comparison.ingest",
+    "sheet_fingerprints": "upl_comparison.ingest",
+    "stream_chunked_excel": "upl_comparison.chunked",
+    "stream_multi_sheet_excel": "upl_comparison.export",
+    "validate_tables": "upl_comparison.validation",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
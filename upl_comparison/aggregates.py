@@ -0,0 +1,71 @@
+"""Per-vendor counters behind the Visualization tabs.
+
+Every analysed tender is folded into a handful of counters per vendor (1st /
+2nd places, sum and count of the 1st-to-2nd gap when ranked 1st, bids), so
+the Win Rate and Average Gap charts are drawn from one row per vendor instead
+of re-scanning every item. Counters are additive: a tender (or a few rows of
+it) can be added and taken back out again.
+"""
+import numpy as np
+import pandas as pd
+
+COUNTERS = ("first", "second", "gap_sum", "gap_count", "bids")
+
+# Charts show at most this many vendors (the ones winning most often)
+DEFAULT_TOP = 20
+
+FIRST_RATE = "1st Win Rate (%)"
+SECOND_RATE = "2nd Win Rate (%)"
+AVERAGE_GAP = "Average Gap (%)"
+
+
+class VendorStats:
+    """Running win / gap counters over any number of analysed tenders."""
+
+    def __init__(self):
+        self.items = 0
+        self.counters = pd.DataFrame(columns=list(COUNTERS), dtype=float).rename_axis("Vendor")
+
+    def add(self, analysis, vendors, sign=1):
+        # ``analysis`` is a Bid & Price Analysis frame (or some of its rows);
+        # sign=-1 removes rows that were added before
+        vendors = list(vendors)
+        n = len(vendors)
+        first = pd.Categorical(analysis["1st Vendor"], categories=vendors).codes
+        second = pd.Categorical(analysis["2nd Vendor"], categories=vendors).codes
+        gap = analysis["Gap 1 to 2 (%)"].to_numpy(dtype=float)
+
+        ranked = first >= 0
+        has_gap = ranked & np.isfinite(gap)
+        prices = analysis[vendors].to_numpy(dtype=float)
+
+        contribution = pd.DataFrame({
+            "first": np.bincount(first[ranked], minlength=n),
+            "second": np.bincount(second[second >= 0], minlength=n),
+            "gap_sum": np.bincount(first[has_gap], weights=gap[has_gap], minlength=n),
+            "gap_count": np.bincount(first[has_gap], minlength=n),
+            "bids": (np.isfinite(prices) & (prices != 0)).sum(axis=0),
+        }, index=pd.Index(vendors, name="Vendor"), dtype=float)
+
+        self.counters = self.counters.add(contribution * sign, fill_value=0)
+        self.items += sign * int(ranked.sum())
+        return self
+
+    def win_rates(self, top=DEFAULT_TOP):
+        # Long format (Vendor, Rank, Win Rate (%)), best 1st-place vendors first
+        items = max(self.items, 1)
+        rates = pd.DataFrame({
+            FIRST_RATE: self.counters["first"] / items * 100,
+            SECOND_RATE: self.counters["second"] / items * 100,
+        })
+        rates = rates.sort_values([FIRST_RATE, SECOND_RATE], ascending=[False, False], kind="stable").head(top)
+        return rates.reset_index().melt("Vendor", var_name="Rank", value_name="Win Rate (%)")
+
+    def average_gaps(self, top=DEFAULT_TOP):
+        # Average gap of every vendor ranked 1st at least once, plus the
+        # benchmark: the mean of those averages
+        ranked = self.counters[self.counters["gap_count"] > 0]
+        gaps = (ranked["gap_sum"] / ranked["gap_count"]).rename(AVERAGE_GAP)
+        benchmark = float(gaps.mean()) if len(gaps) else np.nan
+        gaps = gaps.sort_values(ascending=False, kind="stable").head(top)
+        return gaps.reset_index(), benchmark
@@ -0,0 +1,232 @@
+"""Headless batch comparison of a directory of tender workbooks.
+
+Every workbook goes through validation -> merge -> transpose -> analysis ->
+Super Button export in a worker process of its own, so throughput grows with
+the number of cores. Workbooks breaking the sheet constraints get a
+"<name> - violations.csv" instead of a comparison. Run from the repository root:
+
+    python -m upl_comparison.batch tenders/ results/ --workers 8
+
+Tenders too large for the in-memory views: add --out-of-core --cache-dir .upl_cache
+"""
+import argparse
+import datetime
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# pandas & co. are imported by the functions that need them, so --help and
+# the parent process start instantly; every worker imports them once
+NORMALIZED, FUZZY = "normalized", "fuzzy"  # same values as upl_comparison.matching
+STATIC, CONDITIONAL = "static", "conditional"  # same values as upl_comparison.export
+
+PATTERNS = ("*.xlsx", "*.xls")
+SUMMARY_FILE = "summary.csv"
+
+
+def find_workbooks(directory):
+    # Excel's "~$" lock files are not workbooks
+    paths = {p for pattern in PATTERNS for p in Path(directory).glob(pattern)}
+    return sorted(p for p in paths if not p.name.startswith("~$"))
+
+
+def _load_matrix(data, key, match, cache_dir):
+    # PriceMatrix of a workbook, from its columnar copy when there is one;
+    # raises InvalidWorkbook before comparing a workbook that breaks the rules
+    from upl_comparison.ingest import read_vendor_tables
+    from upl_comparison.matrix import PriceMatrix
+    from upl_comparison.validation import InvalidWorkbook, validate_tables
+
+    store = None
+    if cache_dir is not None:
+        from upl_comparison.columnar import ColumnarStore
+
+        store = ColumnarStore(cache_dir)
+        matrix = store.load_matrix(key, match)
+        if matrix is not None:
+            return matrix
+
+    tables = store.load_tables(key) if store is not None else None
+    if tables is None:
+        # One process per workbook already keeps the cores busy
+        tables = read_vendor_tables(data, max_workers=1)
+    if not tables[0]:
+        raise ValueError("no vendor table found in any sheet")
+    violations = validate_tables(*tables)
+    if not violations.empty:
+        raise InvalidWorkbook(violations)
+
+    matrix = PriceMatrix.from_frames(tables[0], match=match)
+    if store is not None:
+        store.save_tables(key, tables)
+        store.save_matrix(key, matrix)
+    return matrix
+
+
+def _open_chunked(data, key, match, cache_dir):
+    # ChunkedMatrix of a workbook: memory-mapped from its columnar copy when
+    # there is one (parsed and stored first if needed), else in memory, which
+    # copies every price into Arrow next to the matrix
+    from upl_comparison.chunked import ChunkedMatrix
+
+    store = None
+    if cache_dir is not None:
+        from upl_comparison.columnar import ColumnarStore
+
+        store = ColumnarStore(cache_dir)
+        chunked = ChunkedMatrix.from_store(store, key, match)
+        if chunked is not None:
+            return chunked
+
+    matrix = _load_matrix(data, key, match, cache_dir)
+    chunked = ChunkedMatrix.from_store(store, key, match) if store is not None else None
+    return chunked or ChunkedMatrix.from_matrix(matrix)
+
+
+def compare_workbook(
+    path, out_dir, match=NORMALIZED, highlight=STATIC, cache_dir=None, out_of_core=False, history=None,
+    tender_date=None,
+):
+    """Compare one workbook and write its multi-sheet xlsx; returns a summary row.
+
+    With ``cache_dir`` the workbook is parsed only the first time it is seen
+    (see upl_comparison.columnar). With ``out_of_core`` the sheets are never
+    built whole but streamed a chunk of items at a time (see
+    upl_comparison.chunked), memory-mapped from ``cache_dir``; without
+    ``cache_dir`` the chunks are read from an in-memory copy of the matrix,
+    which doubles the memory of the prices.
+    With ``history`` (an SQLite path, see upl_comparison.store) the matrix and
+    its analysis are saved there under the workbook's content hash, dated
+    ``tender_date`` (default: today, or the date it was first saved with); not
+    available with ``out_of_core``, which never builds the analysis.
+    """
+    from upl_comparison.cache import content_hash
+    from upl_comparison.chunked import stream_chunked_excel
+    from upl_comparison.export import stream_multi_sheet_excel
+    from upl_comparison.pipeline import SHEETS
+    from upl_comparison.validation import InvalidWorkbook
+
+    start = time.perf_counter()
+    row = {"workbook": Path(path).name, "status": "ok", "vendors": 0, "items": 0, "output": "", "error": ""}
+    try:
+        data = Path(path).read_bytes()
+        key = content_hash(data)
+        if out_of_core:
+            matrix = _open_chunked(data, key, match, cache_dir)
+            workbook = stream_chunked_excel(list(SHEETS), matrix, highlight=highlight)
+        else:
+            matrix = _load_matrix(data, key, match, cache_dir)
+            sheets = dict(zip(SHEETS, (matrix.merged(), matrix.transposed(), matrix.analysis())))
+            if history is not None:
+                from upl_comparison.store import HistoryStore
+
+                with HistoryStore(history) as store:
+                    store.save_tender(
+                        matrix, sheets[SHEETS[2]], tender_date, name=Path(path).stem, content_hash=key
+                    )
+            workbook = stream_multi_sheet_excel(list(SHEETS), sheets, highlight=highlight)
+
+        output = Path(out_dir) / f"{Path(path).stem} - UPL Comparison.xlsx"
+        with workbook as f, open(output, "wb") as out:
+            shutil.copyfileobj(f, out)
+
+        row.update(vendors=len(matrix.vendors), items=matrix.n_items, output=output.name, hash=key)
+    except InvalidWorkbook as e:
+        # Every violation with its sheet and cell, next to the outputs
+        output = Path(out_dir) / f"{Path(path).stem} - violations.csv"
+        e.violations.to_csv(output, index=False)
+        row.update(status="invalid", output=output.name, error=str(e))
+    except Exception as e:  # one bad workbook must not stop the batch
+        row.update(status="error", error=f"{type(e).__name__}: {e}")
+
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def run_batch(
+    in_dir, out_dir, workers=None, match=NORMALIZED, highlight=STATIC, cache_dir=None, out_of_core=False,
+    history=None, tender_date=None,
+):
+    """Compare every workbook of ``in_dir`` into ``out_dir``; returns the summary frame."""
+    import pandas as pd
+
+    paths = find_workbooks(in_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                compare_workbook, path, out_dir, match, highlight, cache_dir, out_of_core, history, tender_date,
+            )
+            for path in paths
+        ]
+        rows = [future.result() for future in as_completed(futures)]
+
+    columns = ["workbook", "status", "vendors", "items", "seconds", "output", "hash", "error"]
+    summary = pd.DataFrame(rows, columns=columns).sort_values("workbook", ignore_index=True)
+    summary.to_csv(Path(out_dir) / SUMMARY_FILE, index=False)
+    summary.attrs["wall_seconds"] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("in_dir", help="directory with the .xlsx / .xls tender workbooks")
+    parser.add_argument("out_dir", help="directory for the comparison workbooks and summary.csv")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--fuzzy", action="store_true", help="also match item names with typos")
+    parser.add_argument(
+        "--conditional-format", action="store_true",
+        help="highlight with conditional-format rules instead of per-cell formats",
+    )
+    parser.add_argument(
+        "--cache-dir", default=None,
+        help="keep a columnar copy of every parsed workbook here and reuse it on the next run",
+    )
+    parser.add_argument(
+        "--out-of-core", action="store_true",
+        help="stream the sheets a chunk of items at a time instead of building them in memory "
+             "(memory-mapped from --cache-dir, which it needs)",
+    )
+    parser.add_argument(
+        "--history", default=None, metavar="PATH",
+        help="also save every compared tender to this SQLite history (e.g. upl_history.sqlite)",
+    )
+    parser.add_argument(
+        "--tender-date", default=None, metavar="YYYY-MM-DD",
+        help="date of the tenders in --history (default: today; re-saved tenders keep their date)",
+    )
+    args = parser.parse_args(argv)
+    if args.out_of_core and not args.cache_dir:
+        parser.error("--out-of-core reads the matrix memory-mapped from --cache-dir; give one")
+    if args.history and args.out_of_core:
+        parser.error("--history needs the analysis in memory and cannot be used with --out-of-core")
+    if args.tender_date and not args.history:
+        parser.error("--tender-date dates the tenders saved to --history; give one")
+    if args.tender_date:
+        try:
+            datetime.date.fromisoformat(args.tender_date)
+        except ValueError:
+            parser.error(f"--tender-date: {args.tender_date!r} is not a YYYY-MM-DD date")
+
+    summary = run_batch(
+        args.in_dir, args.out_dir, args.workers,
+        FUZZY if args.fuzzy else NORMALIZED,
+        CONDITIONAL if args.conditional_format else STATIC,
+        args.cache_dir,
+        args.out_of_core,
+        args.history,
+        args.tender_date,
+    )
+    print(summary.drop(columns=["hash"]).to_string(index=False))
+
+    failed = int((summary["status"] != "ok").sum())
+    print(f"\n{len(summary)} workbooks, {failed} failed, {summary.attrs['wall_seconds']:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+"""Result cache keyed on the content hash of the uploaded workbook.
+
+Every Streamlit interaction reruns the page script; with the stages memoized
+here a rerun with the same upload only pays for a dictionary lookup.
+"""
+import hashlib
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from upl_comparison.aggregates import VendorStats
+from upl_comparison.chunked import ChunkedMatrix, stream_chunked_excel
+from upl_comparison.export import STATIC, stream_multi_sheet_excel
+from upl_comparison.ingest import read_vendor_tables
+from upl_comparison.matrix import PriceMatrix
+from upl_comparison.pipeline import SHEETS
+from upl_comparison.ranking import rank_columns, rank_from_names
+from upl_comparison.validation import InvalidWorkbook, validate_tables
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Above this many prices the workbook is streamed from a ChunkedMatrix
+# instead of from the three views (see upl_comparison.chunked)
+OUT_OF_CORE_PRICES = 5_000_000
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def estimate_size(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (np.ndarray, PriceMatrix)):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """LRU mapping bounded by the estimated size of its values, in bytes.
+
+    Safe to share between sessions: ``get_or_compute`` lets one caller
+    compute a missing key while the others asking for it wait for that
+    value, so N sessions opening the same workbook cost one computation.
+    A value larger than the whole budget is refused: counted and logged,
+    never kept (CachedComparison holds on to those itself). ``stats()`` has
+    the hit / miss / eviction / refusal counters.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = self.waits = self.evictions = self.refused = 0
+        self._entries = OrderedDict()
+        # Keys being computed: an Event set once the computation is over and
+        # a box holding its value, for a value too large to be kept
+        self._computing = {}
+        # Deferred downloads and background jobs run on threads of their own
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        """Keep ``value``; False when it is larger than the whole budget."""
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                self.refused += 1
+                logger.warning(
+                    "not caching %s: %.1f MB is over the %.1f MB budget",
+                    key[1:] or key, size / 2**20, self.max_bytes / 2**20,
+                )
+                return False
+
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+        return True
+
+    def get_or_compute(self, key, compute):
+        waited = False
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    if waited:
+                        self.waits += 1
+                    else:
+                        self.hits += 1
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+                pending = self._computing.get(key)
+                if pending is None:
+                    # This caller computes it
+                    self.misses += 1
+                    pending = self._computing[key] = (threading.Event(), [])
+                    break
+            # Another caller is computing it: a value too large to keep is
+            # handed over, a failure makes this caller compute it
+            pending[0].wait()
+            if pending[1]:
+                with self._lock:
+                    self.waits += 1
+                return pending[1][0]
+            waited = True
+
+        try:
+            value = compute()
+            if not self.put(key, value):
+                pending[1].append(value)
+        finally:
+            with self._lock:
+                del self._computing[key]
+            pending[0].set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.waits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                # served by a computation another caller had already started
+                "waits": self.waits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                # values larger than the whole budget, never kept
+                "refused": self.refused,
+                "hit_rate": (self.hits + self.waits) / lookups if lookups else None,
+            }
+
+
+class CachedComparison:
+    """One uploaded workbook whose pipeline stages are memoized in ``cache``.
+
+    With ``diagnostics`` (upl_comparison.diagnostics.Diagnostics) every stage
+    actually computed, not served from the cache, is recorded as a span. With
+    ``store`` (upl_comparison.columnar.ColumnarStore) the parsed tables and the
+    price matrix are read back from disk when this workbook was seen before.
+    A stage value the cache refuses (larger than its whole budget) is kept
+    here instead, so it is not recomputed on every rerun. A workbook breaking the sheet constraints (see ``violations``) raises
+    InvalidWorkbook instead of being compared.
+    """
+
+    def __init__(self, data, cache, diagnostics=None, store=None):
+        self.data = data
+        self.key = content_hash(data)
+        self.cache = cache
+        self.diagnostics = diagnostics
+        self.store = store
+        self._refused = {}
+
+    def _get(self, stage, compute):
+        if stage in self._refused:
+            return self._refused[stage]
+        if self.diagnostics is not None:
+            compute = partial(self.diagnostics.record, stage[0], compute)
+        key = (self.key,) + stage
+        value = self.cache.get_or_compute(key, compute)
+        if key not in self.cache:
+            self._refused[stage] = value
+        return value
+
+    def _stored(self, name, compute):
+        # Through ColumnarStore.load_<name> / save_<name> when there is a store
+        if self.store is None:
+            return compute()
+        value = getattr(self.store, f"load_{name}")(self.key)
+        if value is None:
+            value = compute()
+            getattr(self.store, f"save_{name}")(self.key, value)
+        return value
+
+    def tables(self):
+        return self._get(("tables",), lambda: self._stored("tables", lambda: read_vendor_tables(self.data)))
+
+    def frames(self):
+        return self.tables()[0]
+
+    def violations(self):
+        return self._get(("violations",), lambda: validate_tables(*self.tables()))
+
+    def _compare(self):
+        violations = self.violations()
+        if not violations.empty:
+            raise InvalidWorkbook(violations)
+        return PriceMatrix.from_frames(self.frames())
+
+    def matrix(self):
+        return self._get(("matrix",), lambda: self._stored("matrix", self._compare))
+
+    def merged(self):
+        return self._get(("merged",), lambda: self.matrix().merged())
+
+    def transposed(self):
+        return self._get(("transposed",), lambda: self.matrix().transposed())
+
+    def analysis(self):
+        return self._get(("analysis",), lambda: self.matrix().analysis())
+
+    def vendors(self):
+        return list(self.matrix().vendors)
+
+    def sheets(self):
+        return dict(zip(SHEETS, (self.merged(), self.transposed(), self.analysis())))
+
+    def stats(self):
+        # Counters are additive, so an out-of-core tender is counted chunk by
+        # chunk without building its analysis
+        def compute():
+            chunked = self.chunked()
+            if chunked is None:
+                return VendorStats().add(self.analysis(), self.vendors())
+            stats = VendorStats()
+            for chunk in chunked.analysis_chunks():
+                stats.add(chunk, chunked.vendors)
+            return stats
+
+        return self._get(("stats",), compute)
+
+    def ranks(self):
+        return self._get(("ranks",), lambda: {
+            "Transpose Data": rank_columns(self.transposed(), self.vendors()),
+            "Bid & Price Analysis": rank_from_names(self.analysis()),
+        })
+
+    def chunked(self):
+        """The memory-mapped matrix when it is over OUT_OF_CORE_PRICES, else None.
+
+        Read from the store only, so deciding never builds the matrix; not
+        cached. Without a stored copy the in-memory workbook is used.
+        """
+        chunked = ChunkedMatrix.from_store(self.store, self.key) if self.store is not None else None
+        if chunked is None or chunked.n_items * len(chunked.vendors) <= OUT_OF_CORE_PRICES:
+            return None
+        return chunked
+
+    def workbook_file(self, selected_sheets, highlight=STATIC, progress=None):
+        # Out-of-core: a rewound spooled temp file, never read into bytes nor
+        # cached, as large as the tender is
+        return stream_chunked_excel(selected_sheets, self.chunked(), highlight=highlight, progress=progress)
+
+    def workbook(self, selected_sheets, highlight=STATIC, progress=None):
+        # ``progress`` goes to the xlsx writer when the workbook is built
+        def build():
+            ranks = self.ranks() if highlight == STATIC else None
+            output = stream_multi_sheet_excel(
+                selected_sheets, self.sheets(), ranks=ranks, highlight=highlight, progress=progress
+            )
+            with output as f:
+                return f.read()
+
+        return self._get(("workbook", tuple(selected_sheets), highlight), build)
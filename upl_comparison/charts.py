@@ -0,0 +1,50 @@
+"""Altair charts of the Visualization tabs, drawn from aggregates.VendorStats."""
+import math
+
+import altair as alt
+
+from upl_comparison.aggregates import AVERAGE_GAP, FIRST_RATE, SECOND_RATE
+
+RANK_COLORS = {FIRST_RATE: "#1F3BFF", SECOND_RATE: "#FFA41B"}
+ABOVE_COLOR = "#FF3333"
+BELOW_COLOR = "#FFA41B"
+
+
+def win_rate_chart(rates):
+    order = list(dict.fromkeys(rates["Vendor"]))
+    base = alt.Chart(rates, title="Vendor Win Rate Comparison (1st vs 2nd Place)").encode(
+        x=alt.X("Vendor:N", sort=order, title=None),
+        y=alt.Y("Win Rate (%):Q"),
+        color=alt.Color(
+            "Rank:N",
+            scale=alt.Scale(domain=list(RANK_COLORS), range=list(RANK_COLORS.values())),
+            legend=alt.Legend(orient="bottom"),
+        ),
+    )
+    lines = base.mark_line(point=alt.OverlayMarkDef(size=80))
+    labels = base.mark_text(dy=-12, fontWeight="bold").encode(text=alt.Text("Win Rate (%):Q", format=".1f"))
+    return lines + labels
+
+
+def average_gap_chart(gaps, benchmark):
+    # Bars above the benchmark (dashed line) in red, the rest in orange.
+    # Without any gap (a single bidder, no 2nd lowest) the benchmark is NaN:
+    # no line, all bars orange, as NaN is not valid in the Vega spec
+    order = list(gaps["Vendor"])
+    base = alt.Chart(gaps, title="Average Gap (%) per 1st Vendor").encode(
+        x=alt.X("Vendor:N", sort=order, title=None),
+        y=alt.Y(f"{AVERAGE_GAP}:Q"),
+    )
+    labels = base.mark_text(dy=-8, fontWeight="bold").encode(text=alt.Text(f"{AVERAGE_GAP}:Q", format=".1f"))
+    if not math.isfinite(benchmark):
+        return base.mark_bar(color=BELOW_COLOR) + labels
+
+    bars = base.mark_bar().encode(
+        color=alt.condition(
+            alt.datum[AVERAGE_GAP] > benchmark,
+            alt.value(ABOVE_COLOR),
+            alt.value(BELOW_COLOR),
+        )
+    )
+    rule = alt.Chart().mark_rule(strokeDash=[6, 4], color="#A6A6A6", size=2).encode(y=alt.datum(benchmark))
+    return bars + labels + rule
@@ -0,0 +1,260 @@
+"""Out-of-core export of tenders too large for the in-memory views.
+
+Merge Data, Transpose Data and the Bid & Price Analysis of a framework
+agreement with hundreds of thousands of items and dozens of vendors do not
+fit in RAM as pandas frames. Here they are never built whole: the price
+matrix is read a chunk of items at a time from its memory-mapped Arrow copy
+(see upl_comparison.columnar), each chunk's ranking, gaps and medians are
+computed on their own and the rows go straight into the constant-memory
+xlsx writer. Peak memory follows ``chunk_rows``, not the tender; the TOTAL
+rows are running sums written after the last chunk. The page's paged tables
+read just the rows of the visible page the same way (ChunkedMatrix.rows).
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from upl_comparison.columnar import PRICE_COL, item_col, matrix_tables
+from upl_comparison.export import (
+    CHUNK_ROWS, CONDITIONAL, SPOOL_SIZE, STATIC,
+    column_widths, conditional_formats, sheet_plan, stream_workbook, write_rows,
+)
+from upl_comparison.matching import NORMALIZED
+from upl_comparison.pipeline import TOTAL, VENDOR, analyze_prices, flag_totals
+
+
+def _text(column):
+    # Arrow (dictionary) string column -> object array, NaN for the empty cells
+    values = column.cast(pa.string()).to_numpy(zero_copy_only=False)
+    values[pd.isna(values)] = np.nan
+    return values
+
+
+class ChunkedMatrix:
+    """A PriceMatrix read a chunk of items at a time.
+
+    ``table`` has one row per item: the item columns, then one price column
+    per vendor; ``entries`` the (vendor, item) pairs in sheet order. Both are
+    what ColumnarStore.open_matrix maps from disk, so slicing them copies
+    nothing until a chunk is converted.
+    """
+
+    def __init__(self, table, entries, metadata):
+        self.table = table
+        self.entries = entries
+        self.vendors = pd.Index(metadata["vendors"], name=VENDOR)
+        self.item_columns = list(metadata["item_columns"])
+        self.price_col = metadata["price_column"]
+        self.match = metadata["match"]
+
+    @classmethod
+    def from_store(cls, store, key, match=NORMALIZED):
+        """The memory-mapped matrix of workbook ``key`` in a ColumnarStore, or None."""
+        opened = store.open_matrix(key, match)
+        return None if opened is None else cls(*opened)
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        # In memory: still saves building the three views, but copies every
+        # price next to the matrix
+        return cls(*matrix_tables(matrix))
+
+    @property
+    def n_items(self):
+        return self.table.num_rows
+
+    def n_rows(self, sheet):
+        if sheet == "Merge Data":
+            return self.entries.num_rows + len(self.vendors)
+        if sheet == "Transpose Data":
+            return self.n_items + 1
+        return self.n_items
+
+    def total_rows(self, sheet):
+        # Positions of the TOTAL rows in the sheet
+        if sheet == "Merge Data":
+            counts = np.bincount(self._entry_vendor(), minlength=len(self.vendors))
+            return np.cumsum(counts) + np.arange(len(self.vendors))
+        if sheet == "Transpose Data":
+            return np.array([self.n_items])
+        return np.array([], dtype=int)
+
+    # ===== CHUNK READERS =====
+    def _entry_vendor(self):
+        return self.entries["vendor"].to_numpy()
+
+    def items(self, start, stop):
+        return {
+            col: _text(self.table[item_col(k)].slice(start, stop - start))
+            for k, col in enumerate(self.item_columns)
+        }
+
+    def prices(self, start, stop):
+        # (stop - start, n_vendors) float64
+        return np.column_stack([
+            self.table[f"{PRICE_COL}{j}"].slice(start, stop - start).to_numpy()
+            for j in range(len(self.vendors))
+        ]) if len(self.vendors) else np.empty((stop - start, 0))
+
+    def _total_row(self, first, prices):
+        # One TOTAL row: TOTAL in the first item column, "" in the others
+        data = {col: np.array([TOTAL if k == 0 else ""], dtype=object) for k, col in enumerate(self.item_columns)}
+        return {**first, **data, **prices}
+
+    # ===== VIEW CHUNKS =====
+    # Same rows and columns as PriceMatrix.merged / transposed / analysis,
+    # one frame per chunk of at most ``chunk_rows`` items
+    def transposed_chunks(self, chunk_rows=CHUNK_ROWS):
+        totals = np.zeros(len(self.vendors))
+        for start in range(0, self.n_items, chunk_rows):
+            stop = min(start + chunk_rows, self.n_items)
+            prices = self.prices(start, stop)
+            totals += np.nansum(prices, axis=0)
+            data = self.items(start, stop)
+            data.update({vendor: prices[:, j] for j, vendor in enumerate(self.vendors)})
+            yield flag_totals(pd.DataFrame(data), np.zeros(stop - start, dtype=bool))
+
+        total = self._total_row({}, {vendor: totals[j:j + 1] for j, vendor in enumerate(self.vendors)})
+        yield flag_totals(pd.DataFrame(total), [True])
+
+    def analysis_chunks(self, chunk_rows=CHUNK_ROWS):
+        # Every statistic is per item, so a chunk is analysed on its own
+        vendors = list(self.vendors)
+        for start in range(0, self.n_items, chunk_rows):
+            stop = min(start + chunk_rows, self.n_items)
+            prices = self.prices(start, stop)
+            offers = pd.DataFrame(prices, columns=vendors)
+            yield pd.concat([pd.DataFrame(self.items(start, stop)), offers, analyze_prices(prices, vendors)], axis=1)
+
+    def merged_chunks(self, chunk_rows=CHUNK_ROWS):
+        # Vendor by vendor, each block of entries followed by its TOTAL row
+        entry_vendor = self._entry_vendor()
+        entry_item = self.entries["item"].to_numpy()
+        bounds = np.searchsorted(entry_vendor, np.arange(len(self.vendors) + 1))
+        for j, vendor in enumerate(self.vendors):
+            column = self.table[f"{PRICE_COL}{j}"]
+            total = 0.0
+            for start in range(bounds[j], bounds[j + 1], chunk_rows):
+                stop = min(start + chunk_rows, bounds[j + 1])
+                item = pa.array(entry_item[start:stop])
+                price = column.take(item).to_numpy()
+                total += np.nansum(price)
+
+                data = {VENDOR: np.full(stop - start, vendor, dtype=object)}
+                data.update({
+                    col: _text(self.table[item_col(k)].take(item)) for k, col in enumerate(self.item_columns)
+                })
+                data[self.price_col] = price
+                yield flag_totals(pd.DataFrame(data), np.zeros(stop - start, dtype=bool))
+
+            row = self._total_row({VENDOR: np.array([vendor], dtype=object)}, {self.price_col: np.array([total])})
+            yield flag_totals(pd.DataFrame(row), [True])
+
+    def chunks(self, sheet, chunk_rows=CHUNK_ROWS):
+        if sheet == "Merge Data":
+            return self.merged_chunks(chunk_rows)
+        if sheet == "Transpose Data":
+            return self.transposed_chunks(chunk_rows)
+        return self.analysis_chunks(chunk_rows)
+
+    # ===== PAGES =====
+    # Rows start..stop of a view, for the page's paged tables: only those
+    # rows are read, plus one pass over a price column per TOTAL row shown
+    def _vendor_total(self, j):
+        return float(np.nansum(self.table[f"{PRICE_COL}{j}"].to_numpy()))
+
+    def _merged_rows(self, start, stop):
+        total_pos = self.total_rows("Merge Data")
+        rows = np.arange(start, stop)
+        vendor = np.searchsorted(total_pos, rows)
+        is_total = rows == total_pos[vendor]
+        entry = (rows - vendor)[~is_total]
+
+        item = self.entries["item"].to_numpy()[entry]
+        entry_rows = np.flatnonzero(~is_total)
+        price = np.empty(len(rows))
+        for j in np.unique(vendor):
+            price[(vendor == j) & is_total] = self._vendor_total(j)
+            mine = vendor[entry_rows] == j
+            price[entry_rows[mine]] = self.table[f"{PRICE_COL}{j}"].take(pa.array(item[mine])).to_numpy()
+
+        data = {VENDOR: self.vendors.to_numpy(dtype=object)[vendor]}
+        for k, col in enumerate(self.item_columns):
+            values = np.full(len(rows), TOTAL if k == 0 else "", dtype=object)
+            values[entry_rows] = _text(self.table[item_col(k)].take(pa.array(item)))
+            data[col] = values
+        data[self.price_col] = price
+        return flag_totals(pd.DataFrame(data), is_total)
+
+    def _transposed_rows(self, start, stop):
+        start_items, stop_items = min(start, self.n_items), min(stop, self.n_items)
+        prices = self.prices(start_items, stop_items)
+        data = self.items(start_items, stop_items)
+        data.update({vendor: prices[:, j] for j, vendor in enumerate(self.vendors)})
+        frame = flag_totals(pd.DataFrame(data), np.zeros(stop_items - start_items, dtype=bool))
+        if not start <= self.n_items < stop:
+            return frame
+        total = self._total_row({}, {
+            vendor: np.array([self._vendor_total(j)]) for j, vendor in enumerate(self.vendors)
+        })
+        return pd.concat([frame, flag_totals(pd.DataFrame(total), [True])])
+
+    def _analysis_rows(self, start, stop):
+        vendors = list(self.vendors)
+        prices = self.prices(start, stop)
+        offers = pd.DataFrame(prices, columns=vendors)
+        return pd.concat([pd.DataFrame(self.items(start, stop)), offers, analyze_prices(prices, vendors)], axis=1)
+
+    def rows(self, sheet, start, stop):
+        """Rows ``start``..``stop`` of a view, the same rows PriceMatrix's view has there."""
+        stop = min(stop, self.n_rows(sheet))
+        start = min(max(start, 0), stop)
+        if sheet == "Merge Data":
+            return self._merged_rows(start, stop)
+        if sheet == "Transpose Data":
+            return self._transposed_rows(start, stop)
+        return self._analysis_rows(start, stop)
+
+
+def _stream_chunked_sheet(workbook, formats, sheet, chunked, chunk_rows, highlight=STATIC, on_chunk=None):
+    worksheet = workbook.add_worksheet(sheet)
+    widths = None
+    row = 1
+    for df in chunked.chunks(sheet, chunk_rows):
+        if widths is None:
+            worksheet.write_row(0, 0, list(df.columns), formats.header)
+            if highlight == CONDITIONAL:
+                conditional_formats(
+                    worksheet, formats, sheet, df, chunked.n_rows(sheet), chunked.total_rows(sheet)
+                )
+            widths = column_widths(df)
+        else:
+            widths = np.maximum(widths, column_widths(df)).tolist()
+
+        # Rankings and highlights are per row, so a chunk is planned on its own
+        values, codes = sheet_plan(sheet, df, highlight=highlight)
+        write_rows(worksheet, formats, values, codes, 0, len(df), row)
+        row += len(df)
+        if on_chunk is not None:
+            on_chunk(len(df))
+
+    # Column widths are only known after the last chunk; xlsxwriter keeps
+    # them apart from the rows, so setting them last is fine
+    for i, width in enumerate(widths or []):
+        worksheet.set_column(i, i, width)
+
+
+def stream_chunked_excel(
+    selected_sheets, chunked, chunk_rows=CHUNK_ROWS, spool_size=SPOOL_SIZE, highlight=STATIC, progress=None,
+):
+    """The Super Button workbook of a ChunkedMatrix, as stream_multi_sheet_excel writes it.
+
+    Returns a rewound spooled temp file; ``progress(rows_written, rows_total)``
+    is called after every chunk.
+    """
+    def write(workbook, formats, on_chunk):
+        for sheet in selected_sheets:
+            _stream_chunked_sheet(workbook, formats, sheet, chunked, chunk_rows, highlight, on_chunk)
+
+    total = sum(chunked.n_rows(sheet) for sheet in selected_sheets)
+    return stream_workbook(write, total, spool_size, progress)
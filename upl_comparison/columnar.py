@@ -0,0 +1,214 @@
+"""Columnar on-disk copy of every parsed workbook.
+
+Parsing an .xlsx is by far the slowest way to reload a tender already seen.
+Each workbook is converted once into uncompressed Arrow IPC files named
+after the content hash of the source file:
+
+    <directory>/<hash>/long.arrow             every vendor table, stacked, with
+                                              the sheet layouts in its metadata
+    <directory>/<hash>/matrix-<match>.arrow   PriceMatrix items + prices
+    <directory>/<hash>/entries-<match>.arrow  PriceMatrix sheet order
+
+Later opens memory-map those files, so the price columns are used straight
+from the page cache and nothing is parsed again. Arrow IPC rather than
+Parquet because only IPC can be read without decoding.
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from upl_comparison.matching import NORMALIZED
+from upl_comparison.matrix import PriceMatrix
+from upl_comparison.pipeline import VENDOR
+
+DEFAULT_DIR = ".upl_cache"
+FORMAT_VERSION = "2"
+
+# Reserved column names; the real ones are kept in the schema metadata
+VENDOR_COL = "__vendor__"
+PRICE_COL = "__price__"
+
+# Tables Arrow cannot hold as they are (item columns mixing text and numbers,
+# exotic headers) are simply not stored
+_UNSUPPORTED = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, ValueError)
+
+
+def item_col(k):
+    # Arrow column of the k-th item column, in both stored tables and the
+    # matrix upl_comparison.chunked reads
+    return f"__item_{k}__"
+
+
+def _match_name(match):
+    return "raw" if match is None else match
+
+
+def _categorical(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy().astype(np.int32)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, mask=codes < 0),
+            pa.array(values.cat.categories.to_numpy(dtype=object), type=pa.string()),
+        )
+    return pa.array(values.to_numpy(dtype=object), type=pa.string()).dictionary_encode()
+
+
+def _to_category(column):
+    # Arrow dictionary column -> pandas categorical, codes -1 for nulls
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    codes = column.indices.to_numpy(zero_copy_only=False)
+    if column.null_count:
+        codes = np.where(column.is_valid().to_numpy(zero_copy_only=False), codes, -1)
+    categories = pd.Index(column.dictionary.to_numpy(zero_copy_only=False), dtype=object)
+    return pd.Categorical.from_codes(codes.astype(np.int32), categories)
+
+
+def matrix_tables(matrix):
+    # PriceMatrix as (matrix table, entries table, metadata): one row per item
+    # with the item columns and one price column per vendor
+    columns = {item_col(k): _categorical(matrix.items[col]) for k, col in enumerate(matrix.items.columns)}
+    for j in range(len(matrix.vendors)):
+        columns[f"{PRICE_COL}{j}"] = pa.array(matrix.prices[j])
+    metadata = {
+        "vendors": list(matrix.vendors),
+        "item_columns": list(matrix.items.columns),
+        "price_column": matrix.price_col,
+        "match": matrix.match,
+    }
+    entries = pa.table({"vendor": matrix.entry_vendor, "item": matrix.entry_item})
+    return pa.table(columns), entries, metadata
+
+
+class ColumnarStore:
+    """Directory of Arrow IPC copies of parsed workbooks, keyed by content hash."""
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = Path(directory)
+
+    def _path(self, key, name):
+        return self.directory / key / f"{name}.arrow"
+
+    def __contains__(self, key):
+        return self._path(key, "long").exists()
+
+    # ===== WRITE =====
+    def _write(self, key, name, table, **metadata):
+        metadata = {"source_hash": key, "format_version": FORMAT_VERSION, **metadata}
+        table = table.replace_schema_metadata({k: json.dumps(v) for k, v in metadata.items()})
+
+        # Written next to the target and renamed, so readers never see half a file
+        path = self._path(key, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def save_tables(self, key, tables):
+        """Store (frames, layouts) as ingest.read_vendor_tables returned them.
+
+        Returns False when Arrow cannot hold the tables.
+        """
+        frames, layouts = tables
+        if not frames:
+            return False
+        try:
+            columns = {}
+            vendor = np.repeat(np.arange(len(frames), dtype=np.int32), [len(df) for df in frames.values()])
+            columns[VENDOR_COL] = pa.DictionaryArray.from_arrays(vendor, pa.array(list(frames), type=pa.string()))
+            for k in range(next(iter(frames.values())).shape[1] - 1):
+                columns[item_col(k)] = pa.chunked_array(
+                    [_categorical(df.iloc[:, k]) for df in frames.values()]
+                ).unify_dictionaries().combine_chunks()
+            columns[PRICE_COL] = pa.array(
+                np.concatenate([df.iloc[:, -1].to_numpy(dtype=float) for df in frames.values()])
+            )
+            names = {vendor: list(df.columns) for vendor, df in frames.items()}
+            self._write(key, "long", pa.table(columns), columns=names, layouts=layouts)
+        except _UNSUPPORTED:
+            return False
+        return True
+
+    def save_matrix(self, key, matrix):
+        """Store a PriceMatrix built from the workbook ``key``."""
+        try:
+            table, entries, metadata = matrix_tables(matrix)
+            name = _match_name(matrix.match)
+            self._write(key, f"entries-{name}", entries)
+            self._write(key, f"matrix-{name}", table, **metadata)
+        except _UNSUPPORTED:
+            return False
+        return True
+
+    # ===== READ =====
+    def _read(self, key, name):
+        # Memory-mapped table and its metadata, or None when not stored
+        path = self._path(key, name)
+        if not path.exists():
+            return None, None
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        metadata = {k.decode(): json.loads(v) for k, v in (table.schema.metadata or {}).items()}
+        if metadata.get("source_hash") != key or metadata.get("format_version") != FORMAT_VERSION:
+            return None, None
+        return table, metadata
+
+    def load_tables(self, key):
+        """(frames, layouts) as ingest.read_vendor_tables returned them, or None."""
+        table, metadata = self._read(key, "long")
+        if table is None:
+            return None
+
+        vendor = table[VENDOR_COL].combine_chunks().indices.to_numpy()
+        bounds = np.searchsorted(vendor, np.arange(len(metadata["columns"]) + 1))
+        items = [_to_category(table[item_col(k)]) for k in range(table.num_columns - 2)]
+        price = table[PRICE_COL].to_numpy()
+
+        frames = {}
+        for j, (name, columns) in enumerate(metadata["columns"].items()):
+            start, stop = bounds[j], bounds[j + 1]
+            data = {col: items[k][start:stop].remove_unused_categories() for k, col in enumerate(columns[:-1])}
+            data[columns[-1]] = price[start:stop].copy()
+            frames[name] = pd.DataFrame(data)
+        return frames, metadata["layouts"]
+
+    def open_matrix(self, key, match=NORMALIZED):
+        """The stored matrix and entries tables, memory-mapped, with the matrix metadata; or None.
+
+        Nothing is copied: see upl_comparison.chunked for reading them a chunk at a time.
+        """
+        name = _match_name(match)
+        table, metadata = self._read(key, f"matrix-{name}")
+        entries, _ = self._read(key, f"entries-{name}")
+        if table is None or entries is None:
+            return None
+        return table, entries, metadata
+
+    def load_matrix(self, key, match=NORMALIZED):
+        """The stored PriceMatrix for ``match``, or None."""
+        opened = self.open_matrix(key, match)
+        if opened is None:
+            return None
+        table, entries, metadata = opened
+
+        items = pd.DataFrame({
+            col: _to_category(table[item_col(k)]) for k, col in enumerate(metadata["item_columns"])
+        })
+        vendors = pd.Index(metadata["vendors"], name=VENDOR)
+        prices = np.empty((len(vendors), len(items)))
+        for j in range(len(vendors)):
+            prices[j] = table[f"{PRICE_COL}{j}"].to_numpy()
+        return PriceMatrix(
+            items, vendors, prices,
+            entries["vendor"].to_numpy(), entries["item"].to_numpy(),
+            metadata["price_column"], metadata["match"],
+        )
@@ -0,0 +1,198 @@
+"""Per-stage instrumentation: wall time, rows processed and peak memory.
+
+Every pipeline stage (parsing, merge, ranking, Styler rendering, xlsx
+export, ...) runs inside a ``span``. The recorded spans answer "which stage
+made this comparison slow" and can be exported as JSON for a ticket.
+"""
+import datetime
+import json
+import platform
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# Older spans are dropped; the page records a few per rerun
+MAX_SPANS = 500
+
+# tracemalloc is process-wide: started by the first traced span that finds it
+# off, stopped when the last one of any thread closes. Its peak is
+# process-wide too, so a span open at the same time as a traced span of
+# another thread (background jobs, other sessions) gets no peak at all
+_tracing_lock = threading.Lock()
+_tracing_spans = 0
+_tracing_owned = False
+_open_spans = {}  # traced span -> thread id
+
+
+def _start_tracing(span):
+    # True when no traced span of another thread is open, so the peak may be reset
+    global _tracing_spans, _tracing_owned
+    with _tracing_lock:
+        if _tracing_spans == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_spans += 1
+
+        thread = threading.get_ident()
+        others = [other for other, owner in _open_spans.items() if owner != thread]
+        for other in others:
+            other.overlapped = True
+        span.overlapped = bool(others)
+        _open_spans[span] = thread
+        return not others
+
+
+def _stop_tracing(span):
+    global _tracing_spans, _tracing_owned
+    with _tracing_lock:
+        del _open_spans[span]
+        _tracing_spans -= 1
+        if _tracing_spans == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+def count_rows(value):
+    # Rows processed by a stage, from whatever it returned
+    if hasattr(value, "n_items"):
+        return value.n_items
+    if hasattr(value, "shape"):
+        return value.shape[0]
+    if isinstance(value, dict):
+        return sum(count_rows(v) or 0 for v in value.values()) or None
+    if isinstance(value, tuple) and value:
+        return count_rows(value[0])  # (frames, layouts) and the like: data first
+    if isinstance(value, list):
+        return len(value)
+    return None
+
+
+class Span:
+    def __init__(self, stage, depth, rows=None):
+        self.stage = stage
+        self.depth = depth
+        self.rows = rows
+        self.started_at = datetime.datetime.now().isoformat(timespec="milliseconds")
+        self.seconds = 0.0
+        self.child_seconds = 0.0
+        self.peak_bytes = None
+        self.error = None
+        self.overlapped = False
+        self._base = self._high = 0
+
+    def as_dict(self):
+        return {
+            "stage": self.stage,
+            "depth": self.depth,
+            "started_at": self.started_at,
+            "seconds": round(self.seconds, 6),
+            # without the nested spans
+            "self_seconds": round(self.seconds - self.child_seconds, 6),
+            "rows": self.rows,
+            "peak_mb": None if self.peak_bytes is None else round(self.peak_bytes / 2**20, 3),
+            "error": self.error,
+        }
+
+
+class Diagnostics:
+    """Recorder of pipeline spans.
+
+    Spans nest (a merge that has to parse the workbook first holds the
+    parsing span); ``seconds`` includes the nested spans, ``self_seconds``
+    does not. With ``trace_memory`` tracemalloc runs for as long as a span
+    is open, which slows the traced code down several times over, hence off
+    by default. ``peak_mb`` stays empty for a span that overlapped a traced
+    span of another thread: tracemalloc has one peak for the whole process.
+    """
+
+    def __init__(self, trace_memory=False, max_spans=MAX_SPANS):
+        self.trace_memory = trace_memory
+        self.spans = deque(maxlen=max_spans)
+        self._local = threading.local()
+        # Deferred downloads record from a thread of their own
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, stage, rows=None):
+        """Time the block; set ``.rows`` on the yielded span if not known upfront."""
+        stack = self._stack()
+        span = Span(stage, len(stack), rows)
+
+        traced = self.trace_memory
+        if traced:
+            if _start_tracing(span):
+                if stack:
+                    # reset_peak() below would lose the enclosing span's peak so far
+                    stack[-1]._high = max(stack[-1]._high, tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+            span._base = span._high = tracemalloc.get_traced_memory()[0]
+
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.seconds = time.perf_counter() - start
+            stack.pop()
+
+            if traced:
+                span._high = max(span._high, tracemalloc.get_traced_memory()[1])
+                if not span.overlapped:
+                    span.peak_bytes = span._high - span._base
+                if stack:
+                    stack[-1]._high = max(stack[-1]._high, span._high)
+                    stack[-1].overlapped |= span.overlapped
+                _stop_tracing(span)
+
+            if stack:
+                stack[-1].child_seconds += span.seconds
+            with self._lock:
+                self.spans.append(span)
+
+    def record(self, stage, compute):
+        """Run ``compute()`` in a span, counting the rows of its result."""
+        with self.span(stage) as span:
+            value = compute()
+            span.rows = count_rows(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def records(self):
+        with self._lock:
+            return [span.as_dict() for span in self.spans]
+
+    def frame(self):
+        import pandas as pd
+
+        columns = ["stage", "depth", "started_at", "seconds", "self_seconds", "rows", "peak_mb", "error"]
+        return pd.DataFrame(self.records(), columns=columns).astype({"rows": "Int64"})
+
+    def to_json(self, **context):
+        """The spans plus the runtime versions, for attaching to a ticket."""
+        import numpy as np
+        import pandas as pd
+
+        report = {
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "trace_memory": self.trace_memory,
+            **context,
+            "spans": self.records(),
+        }
+        return json.dumps(report, indent=2, default=str)
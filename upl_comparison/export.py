@@ -0,0 +1,339 @@
+"""Super Button export: the comparison frames written as one multi-sheet xlsx.
+
+Two highlight modes: STATIC writes a format on every highlighted cell,
+CONDITIONAL writes the plain numbers and leaves the TOTAL rows and the
+1st / 2nd lowest prices to a few worksheet conditional-format rules that
+Excel evaluates itself, which makes the export and the file smaller.
+"""
+import tempfile
+from io import BytesIO
+
+import numpy as np
+
+from upl_comparison.pipeline import total_mask
+from upl_comparison.ranking import NO_RANK, rank_columns, rank_from_names, rank_masks
+
+# Same header style pandas' to_excel uses, so the sheets keep their look
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+# Streaming export: rows converted per chunk, file kept in RAM up to SPOOL_SIZE
+CHUNK_ROWS = 4096
+SPOOL_SIZE = 16 * 1024 * 1024
+
+# ===== FORMAT REGISTRY =====
+# A cell's format is keyed by (role, is_total, rank, number type), packed into
+# one small integer so a whole sheet gets its codes from array arithmetic.
+# role: how the sheet shows TOTAL rows (green on Merge Data, bold elsewhere)
+MERGE_ROLE, RANKED_ROLE = range(2)
+# rank: 0, or the 1st / 2nd lowest price of the row
+RANK_COLORS = {1: "#C6EFCE", 2: "#FFEB9C"}
+TEXT, RUPIAH, PERCENT = range(3)
+NUM_FORMATS = {RUPIAH: "#,##0", PERCENT: '#,##0.0"%"'}
+TOTAL_HIGHLIGHT = {"bg_color": "#D9EAD3", "font_color": "#1A5E20"}
+# Code of the cells that are not written (NaN / inf / missing)
+SKIP = -1
+
+STATIC, CONDITIONAL = "static", "conditional"
+
+
+def format_code(role, is_total, rank, number):
+    return ((role * 2 + is_total) * 3 + rank) * 3 + number
+
+
+def format_key(code):
+    code, number = divmod(int(code), 3)
+    code, rank = divmod(code, 3)
+    role, is_total = divmod(code, 2)
+    return role, bool(is_total), rank, number
+
+
+def format_properties(role, is_total, rank, number):
+    props = {}
+    if number in NUM_FORMATS:
+        props["num_format"] = NUM_FORMATS[number]
+    if rank:
+        props["bg_color"] = RANK_COLORS[rank]
+    if is_total:
+        props["bold"] = True
+        if role == MERGE_ROLE and not rank:
+            props.update(TOTAL_HIGHLIGHT)
+    return props
+
+
+class FormatRegistry:
+    """Formats of one workbook by code, each added on first use and shared by all sheets."""
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.header = workbook.add_format(HEADER_FORMAT)
+        self._formats = {}
+
+    def __getitem__(self, code):
+        if code not in self._formats:
+            props = format_properties(*format_key(code))
+            self._formats[code] = self.workbook.add_format(props) if props else None
+        return self._formats[code]
+
+    def __len__(self):
+        return len(self._formats)
+
+
+def _sheet_ranks(sheet, df, num_cols):
+    if sheet == "Transpose Data":
+        return rank_columns(df, num_cols)
+    if sheet == "Bid & Price Analysis":
+        return rank_from_names(df)
+    return np.full((len(df), 2), NO_RANK, dtype=np.intp)
+
+
+def _vendor_block(sheet, df, num_cols):
+    # (first, last) position of the vendor price columns the ranking is taken
+    # from, or None when there is none or they do not sit side by side
+    if sheet == "Transpose Data":
+        cols = num_cols
+    elif sheet == "Bid & Price Analysis":
+        cols = [c for c in df.columns if f"{c} to Median (%)" in df.columns]
+    else:
+        return None
+
+    positions = [df.columns.get_loc(c) for c in cols]
+    if not positions or positions != list(range(positions[0], positions[-1] + 1)):
+        return None
+    return positions[0], positions[-1]
+
+
+def _column_runs(codes):
+    # (start, stop, code) of every run of equal codes, SKIP runs left out
+    if len(codes) == 0:
+        return []
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+    stops = np.append(starts[1:], len(codes))
+    keep = codes[starts] != SKIP
+    return list(zip(starts[keep].tolist(), stops[keep].tolist(), codes[starts[keep]].tolist()))
+
+
+def _row_runs(codes):
+    # (row, start, stop, code) of every run of equal codes along the rows
+    # of a 2-D code matrix, SKIP runs left out
+    n_rows, n_cols = codes.shape
+    change = np.ones(codes.shape, dtype=bool)
+    change[:, 1:] = codes[:, 1:] != codes[:, :-1]
+    starts = np.flatnonzero(change)
+    # Every row opens a run, so the next start always closes the current one
+    stops = np.append(starts[1:], codes.size)
+    keep = codes.ravel()[starts] != SKIP
+    starts, stops = starts[keep], stops[keep]
+    rows, cols = np.divmod(starts, n_cols)
+    return zip(rows.tolist(), cols.tolist(), (cols + stops - starts).tolist(), codes.ravel()[starts].tolist())
+
+
+# ===== SHEET WRITER =====
+# Building blocks of both exports: the in-memory frames here and the
+# out-of-core chunks of upl_comparison.chunked
+def column_widths(df):
+    widths = []
+    for col in df.columns:
+        longest = df[col].astype(str).str.len().max()
+        widths.append(max(len(str(col)), longest) + 2)
+    return widths
+
+
+def sheet_plan(sheet, df, ranks=None, highlight=STATIC):
+    # Values of every column and the (n_rows, n_cols) matrix of format codes
+    num_cols = df.select_dtypes(include=["number"]).columns.tolist()
+    pct_cols = [c for c in df.columns if "%" in c]
+    role = MERGE_ROLE if sheet == "Merge Data" else RANKED_ROLE
+
+    # ===== MASKS (once per sheet) =====
+    is_total = np.repeat(total_mask(df)[:, None], df.shape[1], axis=1)
+    if highlight == CONDITIONAL:
+        # Left to the conditional formats (see conditional_formats); a
+        # ranking over scattered columns stays static
+        is_total[:] = False
+        if _vendor_block(sheet, df, num_cols) is not None:
+            ranks = np.full((len(df), 2), NO_RANK, dtype=np.intp)
+    if ranks is None:
+        ranks = _sheet_ranks(sheet, df, num_cols)
+    first, second = rank_masks(ranks, df.shape[1])
+    rank = np.where(first, 1, np.where(second, 2, 0))
+
+    values, valid, zero, number = [], [], [], []
+    for col in df.columns:
+        series = df[col]
+        if col in pct_cols or col in num_cols:
+            column = series.to_numpy(dtype=float, na_value=np.nan)
+            valid.append(np.isfinite(column))
+            zero.append(column == 0)
+            number.append(PERCENT if col in pct_cols else RUPIAH)
+        else:
+            column = series.to_numpy(dtype=object)
+            valid.append(~(series.isna() | series.isin([np.inf, -np.inf])).to_numpy())
+            zero.append(np.zeros(len(df), dtype=bool))
+            number.append(TEXT)
+        values.append(column)
+
+    # No highlight for zero (except Merge Data)
+    if role != MERGE_ROLE:
+        zero = np.column_stack(zero) if zero else np.zeros(df.shape, dtype=bool)
+        is_total = is_total & ~zero
+        rank = np.where(zero, 0, rank)
+
+    codes = format_code(role, is_total.astype(np.int8), rank.astype(np.int8), np.array(number, dtype=np.int8))
+    if valid:
+        codes = np.where(np.column_stack(valid), codes, SKIP)
+    return values, codes.astype(np.int8)
+
+
+def conditional_formats(worksheet, formats, sheet, df, n_rows=None, totals=None):
+    # TOTAL rows and 1st / 2nd lowest as a few rules over the written cells.
+    # A sheet written in chunks passes one chunk as ``df`` (for its columns)
+    # with the row count and the TOTAL row positions of the whole sheet
+    from xlsxwriter.utility import xl_range, xl_rowcol_to_cell
+
+    n_rows = len(df) if n_rows is None else n_rows
+    n_cols = df.shape[1]
+    if n_rows == 0 or n_cols == 0:
+        return
+    role = MERGE_ROLE if sheet == "Merge Data" else RANKED_ROLE
+
+    # ===== TOTAL ROWS: one rule over all of them =====
+    totals = np.flatnonzero(total_mask(df)) if totals is None else np.asarray(totals, dtype=int)
+    totals = (totals + 1).tolist()
+    if totals:
+        ranges = [xl_range(r, 0, r, n_cols - 1) for r in totals]
+        first = xl_rowcol_to_cell(totals[0], 0)
+        worksheet.conditional_format(ranges[0], {
+            "type": "formula",
+            # No highlight for zero (except Merge Data)
+            "criteria": "=TRUE" if role == MERGE_ROLE else f"={first}<>0",
+            "format": formats[format_code(role, 1, 0, TEXT)],
+            "multi_range": " ".join(ranges),
+        })
+
+    # ===== 1ST / 2ND LOWEST =====
+    num_cols = df.select_dtypes(include=["number"]).columns.tolist()
+    block = _vendor_block(sheet, df, num_cols)
+    if block is None:
+        return
+    c0, c1 = block
+    cell = xl_rowcol_to_cell(1, c0)
+    row = f"{xl_rowcol_to_cell(1, c0, col_abs=True)}:{xl_rowcol_to_cell(1, c1, col_abs=True)}"
+    left = f"{xl_rowcol_to_cell(1, c0, col_abs=True)}:{cell}"
+    # Position among the row's non-zero prices; equal prices are ranked left
+    # to right, same as upl_comparison.ranking
+    position = f'COUNTIFS({row},"<"&{cell},{row},"<>0")+COUNTIF({left},{cell})'
+    for rank in (1, 2):
+        worksheet.conditional_format(1, c0, n_rows, c1, {
+            "type": "formula",
+            "criteria": f"=AND(ISNUMBER({cell}),{cell}<>0,{position}={rank})",
+            "format": formats[format_code(role, 0, rank, TEXT)],
+        })
+
+
+def _write_sheet(workbook, formats, sheet, df, ranks=None, highlight=STATIC):
+    worksheet = workbook.add_worksheet(sheet)
+    worksheet.write_row(0, 0, list(df.columns), formats.header)
+
+    # Columns are written in runs of one format, top to bottom
+    values, codes = sheet_plan(sheet, df, ranks, highlight)
+    for c, column in enumerate(values):
+        column = column.tolist()
+        for start, stop, code in _column_runs(codes[:, c]):
+            worksheet.write_column(start + 1, c, column[start:stop], formats[code])
+    if highlight == CONDITIONAL:
+        conditional_formats(worksheet, formats, sheet, df)
+
+    # ===== AUTOFIT =====
+    for i, width in enumerate(column_widths(df)):
+        worksheet.set_column(i, i, width)
+
+
+def _stream_sheet(workbook, formats, sheet, df, chunk_rows, ranks=None, highlight=STATIC, on_chunk=None):
+    # constant_memory flushes a row as soon as the next one starts, so cells
+    # must be written strictly row by row: runs go along the rows here
+    worksheet = workbook.add_worksheet(sheet)
+    for i, width in enumerate(column_widths(df)):
+        worksheet.set_column(i, i, width)
+    worksheet.write_row(0, 0, list(df.columns), formats.header)
+    if highlight == CONDITIONAL:
+        conditional_formats(worksheet, formats, sheet, df)
+
+    values, codes = sheet_plan(sheet, df, ranks, highlight)
+    for start in range(0, len(df), chunk_rows):
+        stop = min(start + chunk_rows, len(df))
+        write_rows(worksheet, formats, values, codes, start, stop, start + 1)
+        if on_chunk is not None:
+            on_chunk(stop - start)
+
+
+def write_rows(worksheet, formats, values, codes, start, stop, first_row):
+    # Rows start:stop of a sheet plan, written row by row from ``first_row``
+    rows = list(zip(*(column[start:stop].tolist() for column in values)))
+    for r, c0, c1, code in _row_runs(codes[start:stop]):
+        worksheet.write_row(first_row + r, c0, rows[r][c0:c1], formats[code])
+
+
+def generate_multi_sheet_excel(selected_sheets, df_dict, ranks=None, highlight=STATIC):
+    # ``ranks`` optionally maps a sheet name to a precomputed ranking
+    # (see upl_comparison.ranking) so it is not computed twice; with
+    # highlight=CONDITIONAL Excel ranks the vendor columns itself
+    import xlsxwriter
+
+    ranks = ranks or {}
+    output = BytesIO()
+
+    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
+    formats = FormatRegistry(workbook)
+    for sheet in selected_sheets:
+        _write_sheet(workbook, formats, sheet, df_dict[sheet], ranks.get(sheet), highlight)
+    workbook.close()
+
+    return output.getvalue()
+
+
+def stream_multi_sheet_excel(
+    selected_sheets, df_dict, ranks=None, chunk_rows=CHUNK_ROWS, spool_size=SPOOL_SIZE, highlight=STATIC,
+    progress=None,
+):
+    # Same workbook as generate_multi_sheet_excel, written with constant_memory
+    # into a spooled temp file that is returned rewound, ready to be read.
+    # ``progress(rows_written, rows_total)`` is called after every chunk; an
+    # exception raised from it abandons the export
+    ranks = ranks or {}
+
+    def write(workbook, formats, on_chunk):
+        for sheet in selected_sheets:
+            _stream_sheet(workbook, formats, sheet, df_dict[sheet], chunk_rows, ranks.get(sheet), highlight, on_chunk)
+
+    total = sum(len(df_dict[sheet]) for sheet in selected_sheets)
+    return stream_workbook(write, total, spool_size, progress)
+
+
+def stream_workbook(write, total_rows, spool_size=SPOOL_SIZE, progress=None):
+    # constant_memory workbook in a spooled temp file, filled by
+    # ``write(workbook, formats, on_chunk)``; on_chunk(rows) is None without
+    # ``progress``. Returned rewound
+    import xlsxwriter
+
+    output = tempfile.SpooledTemporaryFile(max_size=spool_size)
+
+    if progress is not None:
+        written = 0
+
+        def on_chunk(rows):
+            nonlocal written
+            written += rows
+            progress(written, total_rows)
+    else:
+        on_chunk = None
+
+    try:
+        workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+        write(workbook, FormatRegistry(workbook), on_chunk)
+        workbook.close()
+    except BaseException:
+        output.close()
+        raise
+
+    output.seek(0)
+    return output
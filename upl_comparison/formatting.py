@@ -0,0 +1,101 @@
+"""Rupiah display formatting: 7000 -> "7.000", 3600.5 -> "3.600,50"."""
+import numpy as np
+import pandas as pd
+
+
+def format_rupiah(x):
+    if pd.isna(x):
+        return ""
+    # pastikan bisa diubah ke float
+    try:
+        x = float(x)
+    except:
+        return x  # biarin apa adanya kalau bukan angka
+
+    # kalau tidak punya desimal (misal 7000.0), tampilkan tanpa ,00
+    if x.is_integer():
+        formatted = f"{int(x):,}".replace(",", ".")
+    else:
+        formatted = f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        # hapus ,00 kalau desimalnya 0 semua (misal 7000,00 → 7000)
+        if formatted.endswith(",00"):
+            formatted = formatted[:-3]
+    return formatted
+
+
+_CENTS = np.array([f"{i:02d}" for i in range(100)])
+_SPACE, _ZERO, _DOT = ord(" "), ord("0"), ord(".")
+
+
+def _thousands(whole):
+    # Non-negative integers below 2**63 to "1.234.567" strings. The text is
+    # built as a UCS4 code matrix straight from the digits: right-aligned,
+    # cut into groups of three, with a "." in front of every group whose left
+    # neighbour holds a digit
+    n = whole.astype(np.uint64)
+    if not len(n):
+        return np.zeros(0, dtype="U1")
+    n_digits = len(str(int(n.max())))
+    n_groups = -(-n_digits // 3)
+
+    pow10 = 10 ** np.arange(n_digits - 1, -1, -1, dtype=np.uint64)
+    digits = (n[:, None] // pow10 % 10).astype(np.uint32) + _ZERO
+    digits[(n[:, None] < pow10) & (pow10 > 1)] = _SPACE
+
+    groups = np.full((len(n), n_groups * 3), _SPACE, dtype=np.uint32)
+    groups[:, n_groups * 3 - n_digits:] = digits
+    groups = groups.reshape(-1, n_groups, 3)
+
+    codes = np.full((len(n), n_groups, 4), _SPACE, dtype=np.uint32)
+    codes[:, :, 1:] = groups
+    codes[:, 1:, 0] = np.where(groups[:, :-1, 2] != _SPACE, _DOT, _SPACE)
+    return np.char.lstrip(codes.reshape(len(n), -1).view(f"U{n_groups * 4}").ravel())
+
+
+def format_rupiah_array(values):
+    # Column-at-a-time format_rupiah: same strings, one NumPy pass per column
+    values = np.asarray(values)
+    x = values.astype(float).ravel() if values.dtype.kind in "biuf" else None
+    if x is None or (np.abs(x[np.isfinite(x)]) >= 2 ** 63).any():
+        return np.array([format_rupiah(v) for v in values.ravel().tolist()], dtype=object).reshape(values.shape)
+
+    finite = np.isfinite(x)
+    ax = np.abs(x[finite])
+    whole = np.floor(ax)
+
+    # Round the fraction to cents; values too close to a half cent keep the
+    # exact rounding of "%.2f"
+    scaled = (ax - whole) * 100
+    cents = np.floor(scaled + 0.5)
+    carry = cents == 100
+    whole[carry] += 1
+    cents[carry] = 0
+
+    text = _thousands(whole)
+    cents = _CENTS[cents.astype(np.intp)]
+
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9
+    if near_half.any():
+        parts = np.char.rpartition(np.char.mod("%.2f", ax[near_half]), ".")
+        fixed = _thousands(parts[:, 0].astype(float))
+        text = text.astype(np.result_type(text, fixed))
+        text[near_half] = fixed
+        cents[near_half] = parts[:, 2]
+
+    # hapus ,00 kalau desimalnya 0 semua (termasuk angka bulat)
+    text = np.where(cents == "00", text, np.char.add(np.char.add(text, ","), cents))
+    text = np.char.add(np.where(x[finite] < 0, "-", ""), text)
+
+    out = np.zeros(x.shape, dtype=text.dtype)
+    out[finite] = text
+    out[np.isposinf(x)] = "inf"
+    out[np.isneginf(x)] = "-inf"
+    return out.reshape(values.shape)
+
+
+def rupiah_formatter(values):
+    # Formatter for Styler.format: every distinct value is formatted once in
+    # a single vectorized call, each cell is then only a dict lookup
+    unique = pd.unique(pd.Series(np.asarray(values).ravel()))
+    lookup = dict(zip(unique.tolist(), format_rupiah_array(unique).tolist()))
+    return lambda x: lookup[x] if x in lookup else format_rupiah(x)
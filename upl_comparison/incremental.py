@@ -0,0 +1,114 @@
+"""Incremental re-comparison of re-uploaded workbooks.
+
+In a re-bid round vendors resubmit revised prices and the workbook comes
+back with only one or two sheets changed. Every vendor sheet is fingerprinted
+(see ingest.sheet_fingerprints); an update parses only the changed sheets and,
+as long as the item list stays the same, rewrites only their rows of the
+price matrix and the analysis rows whose prices actually moved. The
+changed sheets are checked against the sheet constraints (see
+upl_comparison.validation) before anything is patched.
+"""
+import numpy as np
+
+from upl_comparison.aggregates import VendorStats
+from upl_comparison.ingest import read_bytes, read_vendor_tables, sheet_fingerprints
+from upl_comparison.matrix import PriceMatrix
+from upl_comparison.pipeline import analyze_prices
+from upl_comparison.validation import InvalidWorkbook, validate_tables
+
+
+class IncrementalComparison:
+    """Merge / transpose / analysis of one tender, kept current across uploads."""
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.frames = {}
+        self.layouts = {}
+        self.matrix = None
+        self.analysis = None
+        self.stats = None
+
+    @property
+    def merged(self):
+        return self.matrix.merged()
+
+    @property
+    def transposed(self):
+        return self.matrix.transposed()
+
+    def update(self, source):
+        # Returns the vendor sheets that were parsed again. Raises
+        # InvalidWorkbook, leaving the comparison as it was, when they break
+        # the sheet constraints
+        data = read_bytes(source)
+        fingerprints = sheet_fingerprints(data)
+        changed = [name for name, fp in fingerprints.items() if self.fingerprints.get(name) != fp]
+        parsed, parsed_layouts = read_vendor_tables(data, sheets=changed) if changed else ({}, {})
+
+        frames, layouts = {}, {}
+        for name in fingerprints:
+            if name in changed:
+                layouts[name] = parsed_layouts.get(name)
+                if name in parsed:
+                    frames[name] = parsed[name]
+            else:
+                layouts[name] = self.layouts.get(name)
+                if name in self.frames:
+                    frames[name] = self.frames[name]
+
+        # The unchanged sheets passed before; the changed ones are checked
+        # against the first sheet's columns, unless that sheet is new or
+        # changed itself, which changes the reference for every sheet
+        checked = list(frames)
+        if checked and checked[0] not in changed and checked[0] == next(iter(self.frames), None):
+            checked = checked[:1] + [name for name in changed if name in frames]
+        violations = validate_tables(
+            {name: frames[name] for name in checked}, {name: layouts[name] for name in checked}
+        )
+        if not violations.empty:
+            raise InvalidWorkbook(violations)
+
+        # Vendors added, removed or reordered: nothing to patch
+        patchable = self.matrix is not None and list(frames) == list(self.frames)
+        self.fingerprints, self.frames, self.layouts = fingerprints, frames, layouts
+
+        changed = [name for name in changed if name in frames]
+        if not (patchable and self._patch(changed)):
+            self._recompute()
+        return changed
+
+    def _recompute(self):
+        self.matrix = PriceMatrix.from_frames(self.frames)
+        self.analysis = self.matrix.analysis()
+        self.stats = VendorStats().add(self.analysis, self.matrix.vendors)
+
+    def _patch(self, changed):
+        if not changed:
+            return True
+
+        # A failed swap leaves the matrix half updated; _recompute rebuilds it
+        affected = np.zeros(self.matrix.n_items, dtype=bool)
+        for vendor in changed:
+            moved = self.matrix.replace_vendor(vendor, self.frames[vendor])
+            if moved is None:
+                return False
+            affected |= moved
+
+        # ===== ANALYSIS: changed vendor columns + the rows whose prices moved =====
+        prices, vendors = self.matrix.prices, list(self.matrix.vendors)
+        analysis = self.analysis.copy()
+        for vendor in changed:
+            analysis[vendor] = prices[vendors.index(vendor)].copy()
+
+        rows = np.flatnonzero(affected)
+        if len(rows):
+            patch = analyze_prices(prices[:, rows].T, vendors)
+            for col in patch.columns:
+                analysis.iloc[rows, analysis.columns.get_loc(col)] = patch[col].to_numpy()
+
+            # Chart counters: take the old rows out, put the new ones in
+            self.stats.add(self.analysis.iloc[rows], vendors, sign=-1)
+            self.stats.add(analysis.iloc[rows], vendors)
+
+        self.analysis = analysis
+        return True
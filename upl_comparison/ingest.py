@@ -0,0 +1,299 @@
+"""Vendor workbook ingestion.
+
+Every sheet of the uploaded workbook is one vendor and holds a single
+floating table: non-numeric columns followed by one numeric PRICE column,
+placed anywhere as long as the cells above and to the left are empty.
+"""
+import hashlib
+import itertools
+import os
+import posixpath
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+XLS_MAGIC = b"\xd0\xcf\x11\xe0"
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def read_bytes(source):
+    """The raw bytes of a workbook given as a path, bytes or a file-like object."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    # file-like, e.g. Streamlit's UploadedFile
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source.read()
+
+
+def _filled(value):
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return value.strip() != ""
+    return not pd.isna(value)
+
+
+def _same_cell(value):
+    # The readers disagree on a few cells: calamine gives "" for an empty cell
+    # and 3400.0 for a whole number, openpyxl None and 3400. Item keys and
+    # column labels must not depend on which one is installed
+    if isinstance(value, str):
+        return None if value == "" else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _filled_cells(r, row, stop=None):
+    return [[r, c] for c, v in enumerate(row[:stop]) if _filled(v)]
+
+
+def _filled_run(row):
+    # (start, stop) of the first run of contiguous filled cells
+    filled = [_filled(v) for v in row]
+    start = filled.index(True)
+    stop = start
+    while stop < len(row) and filled[stop]:
+        stop += 1
+    return start, stop
+
+
+def _next_filled(rows):
+    # Every row read up to and including the next one with any value
+    read = []
+    for r, row in rows:
+        read.append((r, row))
+        if any(_filled(v) for v in row):
+            break
+    return read
+
+
+def _is_note(row, below, after):
+    # A first filled row narrower than the next filled one is a note above
+    # the table when it is a single cell, or when the next row's run repeats
+    # on the row after it: then the next row is the header, not a first data
+    # row with a remark right of PRICE
+    start, stop = _filled_run(row)
+    below_start, below_stop = _filled_run(below)
+    if below_stop - below_start <= stop - start:
+        return False
+    if sum(_filled(v) for v in row) == 1:
+        return True
+    if after is None or not any(_filled(v) for v in after):
+        return False
+    return _filled_run(after) == (below_start, below_stop)
+
+
+def _extract_table(rows):
+    # Header = first row with any value; the table spans the contiguous filled
+    # header cells and ends at the first empty row below it. A note above the
+    # table is not its header (see _is_note). Also returns the sheet layout
+    # (0-based positions, see upl_comparison.validation): where the header
+    # starts, the filled cells above, left of or below the table and the
+    # table rows whose PRICE is not a number
+    rows = enumerate(rows)
+    read = _next_filled(rows)
+    if not read or not any(_filled(v) for v in read[-1][1]):
+        return None, None
+    r0, header = read[-1]
+
+    outside = []
+    while True:
+        start, stop = _filled_run(header)
+        ahead = _next_filled(rows)
+        below = ahead[-1] if ahead and any(_filled(v) for v in ahead[-1][1]) else None
+        after = next(rows, None) if below is not None else None
+        if below is not None and _is_note(header, below[1], None if after is None else after[1]):
+            outside += _filled_cells(r0, header)
+            r0, header = below
+            rows = itertools.chain([] if after is None else [after], rows)
+            continue
+        rows = itertools.chain(ahead, [] if after is None else [after], rows)
+        break
+    width = stop - start
+
+    data = []
+    for r, row in rows:
+        cells = tuple(row[start:stop])
+        if not any(_filled(v) for v in cells):
+            outside += _filled_cells(r, row)
+            break
+        # Readers give "" (calamine) or None (openpyxl) for empty cells;
+        # counting those is much cheaper than testing every cell
+        if start and row[:start].count("") + row[:start].count(None) != start:
+            outside += _filled_cells(r, row, start)
+        data.append(cells + (None,) * (width - len(cells)))
+    # Notes below the table belong in a text box, not in cells
+    for r, row in rows:
+        outside += _filled_cells(r, row)
+
+    columns = [str(c).strip() if isinstance(c, str) else _same_cell(c) for c in header[start:stop]]
+    df = pd.DataFrame.from_records(data, columns=columns)
+    layout = {"origin": [r0, start], "outside": outside, "non_numeric": _non_numeric(df)}
+    return _typed_frame(df), layout
+
+
+def _non_numeric(df):
+    # Table rows whose last (PRICE) cell is filled but not a number
+    if df.shape[1] == 0:
+        return []
+    raw = df.iloc[:, -1]
+    candidates = np.flatnonzero(raw.notna().to_numpy() & pd.to_numeric(raw, errors="coerce").isna().to_numpy())
+    return [int(i) for i in candidates if _filled(raw.iat[i])]
+
+
+def _typed_frame(df):
+    # Non-numeric columns become categoricals, the last (PRICE) column float64
+    if df.shape[1] == 0:
+        return df
+    price = df.columns[-1]
+    df[price] = pd.to_numeric(df[price], errors="coerce").astype("float64")
+    for col in df.columns[:-1]:
+        df[col] = _same_categories(df[col].astype("category"))
+    return df
+
+
+def _same_categories(values):
+    # _same_cell on the categories instead of every cell; whole numbers mixed
+    # with others keep object categories, so 3400 does not turn into 3400.0
+    categories = list(values.cat.categories)
+    same = [_same_cell(v) for v in categories]
+    if all(a is b for a, b in zip(same, categories)):
+        return values
+    kept = pd.Index([v for v in same if v is not None], dtype=object).unique()
+    if kept.inferred_type == "integer":
+        kept = kept.astype("int64")
+    # Code -1 (an empty cell) stays -1
+    codes = np.append(kept.get_indexer(same), -1)[values.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(kept)), index=values.index)
+
+
+def _openpyxl_sheets(data):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+    readers = [(ws.title, lambda ws=ws: ws.iter_rows(values_only=True)) for ws in workbook.worksheets]
+    return readers, workbook.close
+
+
+def _calamine():
+    # Optional, faster reader; imported on first use
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        return None
+    return CalamineWorkbook
+
+
+def _calamine_sheets(data):
+    workbook = _calamine().from_filelike(BytesIO(data))
+    # The workbook handle is not shareable between threads while a sheet is
+    # being decoded; the table extraction itself still runs in parallel
+    lock = threading.Lock()
+
+    def rows(name):
+        with lock:
+            grid = workbook.get_sheet_by_name(name).to_python(skip_empty_area=False)
+        return iter(grid)
+
+    readers = [(name, lambda name=name: rows(name)) for name in workbook.sheet_names]
+    return readers, workbook.close
+
+
+def _pandas_sheets(data):
+    # Legacy .xls without calamine: pandas' own reader (xlrd)
+    grids = pd.read_excel(BytesIO(data), sheet_name=None, header=None)
+    readers = [(name, lambda grid=grid: grid.itertuples(index=False, name=None)) for name, grid in grids.items()]
+    return readers, grids.clear
+
+
+def _sheet_readers(data):
+    if _calamine() is not None:
+        return _calamine_sheets(data)
+    if data[:4] == XLS_MAGIC:
+        return _pandas_sheets(data)
+    return _openpyxl_sheets(data)
+
+
+def _xlsx_fingerprints(data):
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{_NS_PKG_REL}Relationship")}
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+
+        # Sheets reference shared strings by index, so their table is part of
+        # every sheet's fingerprint
+        names = set(archive.namelist())
+        shared = archive.read("xl/sharedStrings.xml") if "xl/sharedStrings.xml" in names else b""
+        shared = hashlib.blake2b(shared, digest_size=16).digest()
+
+        fingerprints = {}
+        for sheet in workbook.iter(f"{_NS_MAIN}sheet"):
+            target = targets[sheet.get(f"{_NS_REL}id")]
+            path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(f"xl/{target}")
+            fingerprints[sheet.get("name")] = hashlib.blake2b(shared + archive.read(path), digest_size=16).hexdigest()
+
+    return fingerprints
+
+
+def sheet_fingerprints(source):
+    """Content hash of every sheet, without parsing any cell.
+
+    For .xlsx each sheet is hashed from its own XML part (plus the shared
+    string table), so re-uploading a workbook where one vendor revised its
+    prices changes only that vendor's fingerprint. Other formats fall back to
+    the hash of the whole file for every sheet.
+    """
+    data = read_bytes(source)
+    if zipfile.is_zipfile(BytesIO(data)):
+        return _xlsx_fingerprints(data)
+
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    readers, close = _sheet_readers(data)
+    close()
+    return {name: digest for name, _ in readers}
+
+
+def read_vendor_tables(source, max_workers=None, sheets=None):
+    """Like read_vendor_workbook, also returning {sheet name: layout} of every sheet.
+
+    The layouts hold the positions upl_comparison.validation reports
+    violations at; sheets without any table have a layout of None.
+    """
+    readers, close = _sheet_readers(read_bytes(source))
+    if sheets is not None:
+        wanted = set(sheets)
+        readers = [reader for reader in readers if reader[0] in wanted]
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            tables = list(pool.map(lambda reader: _extract_table(reader[1]()), readers))
+    finally:
+        close()
+
+    frames = {name: df for (name, _), (df, _) in zip(readers, tables) if df is not None}
+    layouts = {name: layout for (name, _), (_, layout) in zip(readers, tables)}
+    return frames, layouts
+
+
+def read_vendor_workbook(source, max_workers=None, sheets=None):
+    """Read every vendor sheet of a workbook into {sheet name: typed table}.
+
+    ``source`` is a path, the raw bytes or a file-like object. The workbook is
+    opened once and its sheets are parsed in parallel on a thread pool; sheets
+    without any table are left out. ``sheets`` limits parsing to the given
+    sheet names.
+    """
+    return read_vendor_tables(source, max_workers, sheets)[0]
@@ -0,0 +1,226 @@
+"""Background jobs for the heavy pipeline stages.
+
+A Streamlit rerun must not block on parsing or on the xlsx export: the page
+submits a job, shows its progress from a polling fragment and picks up the
+result on a later rerun. Jobs run on one thread pool shared by every
+session; each session keeps its own ``JobRunner``, so finished results stay
+with the session that asked for them.
+
+Cancellation is cooperative: a job only stops at its next ``report`` call,
+which the stages below make between stages and after every chunk of rows
+written by the export.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# The stages release the GIL in pandas / numpy / the xlsx parser
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool():
+    # Created on first use, so importing the module starts no thread
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="upl-job")
+        return _pool
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``Job.report`` once the job was cancelled."""
+
+
+class Job:
+    """One submitted computation: status, progress and, once done, its result."""
+
+    def __init__(self, key):
+        self.key = key
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = "Waiting for a worker"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.seconds = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def report(self, fraction, message=None):
+        """Record progress (0..1); raises JobCancelled when the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def cancel(self):
+        self._cancel.set()
+        # Never started: it will not be
+        if self.future is not None and self.future.cancel():
+            self.status = CANCELLED
+            self.message = "Cancelled"
+
+    def _run(self, fn, args, kwargs):
+        if self._cancel.is_set():
+            self.status = CANCELLED
+            return
+        self.status = RUNNING
+        self.message = "Running"
+        start = time.perf_counter()
+        try:
+            self.result = fn(self, *args, **kwargs)
+        except JobCancelled:
+            self.status = CANCELLED
+            self.message = "Cancelled"
+        except Exception as e:
+            self.error = e
+            self.status = FAILED
+            self.message = f"{type(e).__name__}: {e}"
+        else:
+            self.progress = 1.0
+            self.message = "Done"
+            self.status = DONE
+        finally:
+            self.seconds = time.perf_counter() - start
+
+
+class JobRunner:
+    """The jobs of one session, by key.
+
+    A key is a tuple whose first element is the kind of job ("compare",
+    "workbook", ...); the rest identifies its inputs. Submitting a key that
+    already has a job returns that job, so finished work is never redone.
+    """
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def submit(self, key, fn, *args, **kwargs):
+        """The job for ``key``, starting ``fn(job, *args, **kwargs)`` if there is none.
+
+        A cancelled job is replaced by a new one; a failed one stays (its
+        error is not retried on every rerun) until it is dropped.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != CANCELLED:
+                return job
+            job = Job(key)
+            self._jobs[key] = job
+        job.future = (self.executor or shared_pool()).submit(job._run, fn, args, kwargs)
+        return job
+
+    def drop(self, key):
+        """Forget the job of ``key``, cancelling it if it still runs.
+
+        The next submit of ``key`` starts afresh, e.g. to retry a failed job.
+        """
+        with self._lock:
+            job = self._jobs.pop(key, None)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def cancel_stale(self, key):
+        """Cancel the jobs of the same kind as ``key`` whose inputs differ.
+
+        Finished ones are forgotten too; their results, when the stages are
+        cached, come back at no cost if those inputs are selected again.
+        """
+        with self._lock:
+            stale = [k for k in self._jobs if k[0] == key[0] and k != key]
+            jobs = [self._jobs.pop(k) for k in stale]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for job in jobs:
+            job.cancel()
+
+
+# ===== JOBS =====
+# Stages of CachedComparison, in order, with their progress label
+COMPARE_STAGES = [
+    ("tables", "Reading the workbook"),
+    ("violations", "Checking the sheet constraints"),
+    ("matrix", "Matching the items"),
+    ("merged", "Merging the sheets"),
+    ("transposed", "Transposing"),
+    ("analysis", "Analysing the prices"),
+    ("ranks", "Ranking the vendors"),
+    ("stats", "Counting the wins"),
+]
+# Skipped for a tender over the out-of-core size (CachedComparison.chunked):
+# its pages are read from the memory-mapped matrix instead
+VIEW_STAGES = ("merged", "transposed", "analysis", "ranks")
+
+
+def compare_job(job, comparison):
+    """Fill the cache of a CachedComparison, stage by stage.
+
+    Returns the constraint violations; the remaining stages are skipped
+    when there are any. The in-memory views are skipped too once the
+    matrix turns out to be out-of-core.
+    """
+    violations = None
+    out_of_core = False
+    for i, (stage, message) in enumerate(COMPARE_STAGES):
+        if out_of_core and stage in VIEW_STAGES:
+            continue
+        job.report(i / len(COMPARE_STAGES), message)
+        value = getattr(comparison, stage)()
+        if stage == "violations":
+            violations = value
+            if not violations.empty:
+                break
+        if stage == "matrix":
+            out_of_core = comparison.chunked() is not None
+    return violations
+
+
+def workbook_job(job, comparison, selected_sheets, highlight):
+    """The xlsx of CachedComparison.workbook, reporting every chunk written.
+
+    A tender over the out-of-core size (see CachedComparison.chunked) is
+    returned as the spooled file of CachedComparison.workbook_file instead
+    of bytes.
+    """
+    def progress(written, total):
+        job.report(written / total if total else 1.0, f"Writing rows: {written:,} / {total:,}")
+
+    job.report(0.0, "Preparing the sheets")
+    if comparison.chunked() is not None:
+        return comparison.workbook_file(selected_sheets, highlight, progress=progress)
+    comparison.sheets()
+    return comparison.workbook(selected_sheets, highlight, progress=progress)
@@ -0,0 +1,162 @@
+"""Item matching across vendor sheets.
+
+Items are matched on a 64-bit hash of their case- and whitespace-folded item
+columns, so "Cross connect" and "cross  Connect " land on the same row of the
+Transpose Data sheet. Optional fuzzy matching also folds typos ("Corss
+connect"): candidate pairs come from a character n-gram index built inside
+blocks of items that agree on every other column and on the model tokens of
+the text, so only near neighbours are ever compared, never every pair. Two
+items are only folded together when they come from different vendors: a
+sheet's own near-duplicates ("Dismantle RAU", "Dismantle RRU") are different
+items, never typos of each other.
+"""
+import difflib
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+NORMALIZED = "normalized"
+FUZZY = "fuzzy"
+
+DEFAULT_THRESHOLD = 0.85
+NGRAM = 3
+# n-grams shared by more items than this are too common to narrow anything down
+MAX_POSTING = 200
+
+# Tokens compared exactly, never fuzzily: anything with a digit ("2x",
+# "rru3908", "48") and the short codes ("rau", "odf", "bts") where one letter
+# is another model, not a typo
+_MODEL = re.compile(r"\b(?:\w*\d\w*|\w{1,3})\b")
+
+
+def _fold(values):
+    return values.str.casefold().str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def normalize_text(series):
+    # Case- and whitespace-folded text; every distinct value is folded once
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    folded = _fold(pd.Series(uniques.astype(str), dtype=object)).to_numpy(dtype=object)
+    return pd.Series(np.append(folded, "")[codes], index=series.index)
+
+
+def item_keys(items, normalize=True):
+    """uint64 key of every row of ``items`` (the non-numeric columns)."""
+    if normalize:
+        items = pd.DataFrame({col: normalize_text(items[col]) for col in items.columns})
+    return pd.util.hash_pandas_object(items, index=False, categorize=True).to_numpy()
+
+
+def _grams(text):
+    padded = f" {text} "
+    return {padded[i:i + NGRAM] for i in range(max(len(padded) - NGRAM + 1, 1))}
+
+
+def _similar_pairs(texts, threshold):
+    # Pairs (i, j) of texts at least ``threshold`` alike, via an n-gram index
+    grams = [_grams(t) for t in texts]
+    postings = defaultdict(list)
+    for i, g in enumerate(grams):
+        for gram in g:
+            postings[gram].append(i)
+
+    for i, g in enumerate(grams):
+        shared = defaultdict(int)
+        for gram in g:
+            posting = postings[gram]
+            if len(posting) <= MAX_POSTING:
+                for j in posting:
+                    if j > i:
+                        shared[j] += 1
+
+        for j, count in shared.items():
+            # Cheap n-gram filter first, the exact ratio only for survivors
+            if 2 * count / (len(g) + len(grams[j])) < threshold / 2:
+                continue
+            ratio = difflib.SequenceMatcher(None, texts[i], texts[j]).ratio()
+            if ratio >= threshold:
+                yield i, j, ratio
+
+
+def _typo(a, b):
+    # Same words, each at most one letter longer or shorter: "conect" is a
+    # typo of "connect", "uninstall" is not one of "install"
+    a, b = a.split(), b.split()
+    return len(a) == len(b) and all(abs(len(x) - len(y)) <= 1 for x, y in zip(a, b))
+
+
+def fuzzy_keys(items, keys, sheets, threshold=DEFAULT_THRESHOLD):
+    """Map near-duplicate items of different sheets onto one key.
+
+    ``sheets`` holds the sheet (vendor) of every row. The column with the
+    most distinct values (the description, in practice) is compared fuzzily;
+    items are only compared inside blocks that agree on every other column
+    and on the model tokens of that text. A pair is folded only when no
+    sheet lists both sides and each side is the only candidate of its sheet
+    for the other; keys that share a sheet are never joined, however alike.
+    Each group takes the key of the item seen first.
+    """
+    codes, uniques = pd.factorize(keys)
+    first = np.unique(codes, return_index=True)[1]
+    distinct = items.iloc[first].reset_index(drop=True)
+    if len(distinct) < 2:
+        return keys
+
+    folded = pd.DataFrame({col: normalize_text(distinct[col]) for col in distinct.columns})
+    text_col = folded.nunique().idxmax()
+    texts = folded[text_col].tolist()
+    models = folded[text_col].str.findall(_MODEL).str.join(" ")
+    blocks = pd.concat([folded.drop(columns=text_col), models.rename("\x00models")], axis=1)
+
+    # Sheets listing each distinct item
+    in_sheets = [set() for _ in range(len(distinct))]
+    for code, sheet in set(zip(codes.tolist(), np.asarray(sheets).tolist())):
+        in_sheets[code].add(sheet)
+
+    pairs = []
+    for members in blocks.groupby(list(blocks.columns), sort=False).indices.values():
+        if len(members) < 2:
+            continue
+        for a, b, ratio in _similar_pairs([texts[m] for m in members], threshold):
+            a, b = members[a], members[b]
+            if _typo(texts[a], texts[b]) and not in_sheets[a] & in_sheets[b]:
+                pairs.append((ratio, a, b))
+
+    # A sheet with two candidates for one item is ambiguous: neither is taken
+    candidates = defaultdict(int)
+    for _, a, b in pairs:
+        for sheet in in_sheets[b]:
+            candidates[a, sheet] += 1
+        for sheet in in_sheets[a]:
+            candidates[b, sheet] += 1
+
+    def unique(a, b):
+        return all(candidates[a, sheet] == 1 for sheet in in_sheets[b])
+
+    parent = np.arange(len(distinct))
+    group_sheets = {i: in_sheets[i] for i in range(len(distinct))}
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Closest pairs first; a group never takes two items of one sheet
+    for _, a, b in sorted(pairs, key=lambda pair: -pair[0]):
+        if not (unique(a, b) and unique(b, a)):
+            continue
+        ra, rb = root(a), root(b)
+        if ra == rb or group_sheets[ra] & group_sheets[rb]:
+            continue
+        lead, other = min(ra, rb), max(ra, rb)  # the earliest item leads
+        parent[other] = lead
+        group_sheets[lead] = group_sheets[lead] | group_sheets.pop(other)
+
+    roots = np.array([root(i) for i in range(len(distinct))])
+    return uniques[roots][codes]
@@ -0,0 +1,195 @@
+"""Columnar model of a tender: an items table plus a dense vendors x items price matrix.
+
+Merge Data, Transpose Data and the Bid & Price Analysis are views computed
+from it, so memory follows the number of prices instead of the number of
+string cells, and TOTAL rows only exist in the views.
+"""
+import numpy as np
+import pandas as pd
+
+from upl_comparison.matching import FUZZY, NORMALIZED, fuzzy_keys, item_keys
+from upl_comparison.pipeline import TOTAL, VENDOR, analyze_prices, flag_totals
+
+
+def _scatter(vendor, item, values, n_vendors, n_items):
+    # Duplicated (vendor, item) prices are summed; NaN where nothing is priced
+    flat = vendor.astype(np.int64) * n_items + item
+    valid = ~np.isnan(values)
+    size = n_vendors * n_items
+    sums = np.bincount(flat[valid], weights=values[valid], minlength=size)
+    counts = np.bincount(flat[valid], minlength=size)
+    return np.where(counts > 0, sums, np.nan).reshape(n_vendors, n_items)
+
+
+def _entries(vendor, item, n_items):
+    # (vendor, item) pairs in sheet order, first occurrence only
+    _, first = np.unique(vendor.astype(np.int64) * n_items + item, return_index=True)
+    first.sort()
+    return vendor[first].astype(np.int32), item[first].astype(np.int32)
+
+
+def _with_label(column, label, codes, label_pos, n_rows):
+    # Categorical view of an item column with TOTAL / "" written at label_pos
+    categories = column.cat.categories
+    if label not in categories:
+        categories = categories.append(pd.Index([label]))
+
+    out = np.empty(n_rows, dtype=np.int32)
+    out[label_pos] = categories.get_loc(label)
+    out[np.setdiff1d(np.arange(n_rows), label_pos, assume_unique=True)] = codes
+    return pd.Categorical.from_codes(out, categories)
+
+
+class PriceMatrix:
+    """Vendors x items price matrix with its item and vendor dictionaries.
+
+    ``items`` has one row per distinct item, categorical columns, sorted the
+    way Transpose Data lists them. ``vendors`` keeps the sheet order and
+    ``prices`` is float64 of shape (n_vendors, n_items), NaN where a vendor's
+    sheet does not list the item. ``entry_vendor`` / ``entry_item`` record every
+    sheet's own row order for the Merge Data view.
+    """
+
+    def __init__(self, items, vendors, prices, entry_vendor, entry_item, price_col, match=NORMALIZED):
+        self.items = items
+        self.vendors = vendors
+        self.prices = prices
+        self.entry_vendor = entry_vendor
+        self.entry_item = entry_item
+        self.price_col = price_col
+        self.match = match
+        self._keys = None
+
+    @classmethod
+    def from_frames(cls, frames, match=NORMALIZED, threshold=None):
+        """Build the matrix from {vendor: table}.
+
+        ``match`` decides which rows of different sheets are the same item:
+        None compares the raw cells, NORMALIZED folds case and whitespace and
+        FUZZY also folds typos (see upl_comparison.matching).
+        """
+        # Column names come from the first sheet: the logic relies on column
+        # positions, not on names
+        columns = list(next(iter(frames.values())).columns)
+        item_cols, price_col = columns[:-1], columns[-1]
+        vendors = pd.Index(list(frames), name=VENDOR)
+
+        long = pd.concat(
+            [df.set_axis(columns, axis=1).astype({c: object for c in item_cols}) for df in frames.values()],
+            ignore_index=True,
+        )
+        vendor = np.repeat(np.arange(len(vendors)), [len(df) for df in frames.values()])
+
+        keys = item_keys(long[item_cols], normalize=match is not None)
+        if match == FUZZY:
+            keys = fuzzy_keys(long[item_cols], keys, vendor, **({} if threshold is None else {"threshold": threshold}))
+
+        # Every item is shown with its first spelling; items are numbered in
+        # sorted order, the order of the Transpose Data sheet
+        codes, _ = pd.factorize(keys)
+        _, first = np.unique(codes, return_index=True)
+        items = long[item_cols].iloc[first].reset_index(drop=True)
+        order = items.sort_values(item_cols, na_position="last", kind="stable").index.to_numpy()
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+        item = rank[codes]
+        items = items.iloc[order].reset_index(drop=True).astype("category")
+
+        prices = _scatter(vendor, item, long[price_col].to_numpy(dtype=float), len(vendors), len(items))
+        entry_vendor, entry_item = _entries(vendor, item, len(items))
+        return cls(items, vendors, prices, entry_vendor, entry_item, price_col, match)
+
+    @property
+    def n_items(self):
+        return len(self.items)
+
+    @property
+    def nbytes(self):
+        return (
+            int(self.items.memory_usage(deep=True).sum())
+            + self.prices.nbytes
+            + self.entry_vendor.nbytes
+            + self.entry_item.nbytes
+        )
+
+    def item_keys(self):
+        if self._keys is None:
+            self._keys = pd.Index(item_keys(self.items, normalize=self.match is not None))
+        return self._keys
+
+    def vendor_totals(self):
+        return np.nansum(self.prices, axis=1)
+
+    # ===== VIEWS =====
+    def merged(self):
+        n_vendors = len(self.vendors)
+        counts = np.bincount(self.entry_vendor, minlength=n_vendors)
+        n_rows = len(self.entry_vendor) + n_vendors
+
+        # Each vendor block is followed by its TOTAL row
+        total_pos = np.cumsum(counts) + np.arange(n_vendors)
+        entry_pos = np.arange(len(self.entry_vendor)) + self.entry_vendor
+
+        vendor_codes = np.empty(n_rows, dtype=np.int32)
+        vendor_codes[entry_pos] = self.entry_vendor
+        vendor_codes[total_pos] = np.arange(n_vendors)
+
+        data = {VENDOR: pd.Categorical.from_codes(vendor_codes, self.vendors)}
+        for k, col in enumerate(self.items.columns):
+            codes = self.items[col].cat.codes.to_numpy()[self.entry_item]
+            data[col] = _with_label(self.items[col], TOTAL if k == 0 else "", codes, total_pos, n_rows)
+
+        price = np.empty(n_rows)
+        price[entry_pos] = self.prices[self.entry_vendor, self.entry_item]
+        price[total_pos] = self.vendor_totals()
+        data[self.price_col] = price
+        return flag_totals(pd.DataFrame(data), np.isin(np.arange(n_rows), total_pos))
+
+    def transposed(self):
+        n_rows = self.n_items + 1
+        total_pos = np.array([self.n_items])
+
+        data = {}
+        for k, col in enumerate(self.items.columns):
+            codes = self.items[col].cat.codes.to_numpy()
+            data[col] = _with_label(self.items[col], TOTAL if k == 0 else "", codes, total_pos, n_rows)
+        for j, vendor in enumerate(self.vendors):
+            data[vendor] = np.append(self.prices[j], np.nansum(self.prices[j]))
+        return flag_totals(pd.DataFrame(data), np.arange(n_rows) == self.n_items)
+
+    def analysis(self, dtype=np.float64):
+        vendors = list(self.vendors)
+        offers = pd.DataFrame(self.prices.T.copy(), columns=vendors)
+        return pd.concat([self.items, offers, analyze_prices(self.prices.T, vendors, dtype=dtype)], axis=1)
+
+    # ===== INCREMENTAL UPDATE =====
+    def replace_vendor(self, vendor, df):
+        # Swap in a vendor's revised sheet. Returns the mask of items whose
+        # price changed, or None when the item dictionary itself would change
+        # (unknown item, or the last offer of an item disappears)
+        item_cols = list(self.items.columns)
+        if df.shape[1] != len(item_cols) + 1 or self.match == FUZZY:
+            return None  # fuzzy groups may change with any new spelling
+
+        part = df.set_axis(item_cols + [self.price_col], axis=1)
+        item = self.item_keys().get_indexer(item_keys(part[item_cols], normalize=self.match is not None))
+        if (item < 0).any():
+            return None
+
+        j = self.vendors.get_loc(vendor)
+        vendor_idx = np.full(len(item), j)
+        ev, ei = _entries(vendor_idx, item, self.n_items)
+
+        start, stop = np.searchsorted(self.entry_vendor, [j, j + 1])
+        entry_vendor = np.concatenate([self.entry_vendor[:start], ev, self.entry_vendor[stop:]])
+        entry_item = np.concatenate([self.entry_item[:start], ei, self.entry_item[stop:]])
+        if (np.bincount(entry_item, minlength=self.n_items) == 0).any():
+            return None
+
+        row = _scatter(np.zeros(len(item), dtype=np.intp), item, part[self.price_col].to_numpy(dtype=float), 1, self.n_items)[0]
+        old = self.prices[j]
+        moved = ~((row == old) | (np.isnan(row) & np.isnan(old)))
+
+        self.prices[j] = row
+        self.entry_vendor, self.entry_item = entry_vendor, entry_item
+        return moved
@@ -0,0 +1,54 @@
+"""Server-side filtering, sorting and paging of the comparison tables.
+
+The page only styles and sends the rows of the visible page, so the cost of a
+rerun depends on the page size instead of the size of the tender. Everything
+here works on row positions; the caller slices the frame (and its ranking)
+with them.
+"""
+import numpy as np
+import pandas as pd
+
+from upl_comparison.pipeline import total_mask
+
+DEFAULT_PAGE_SIZE = 100
+
+
+def _contains(series, query):
+    # Categoricals are matched once per category, not once per row
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        hit = series.cat.categories.astype(str).str.contains(query, case=False, regex=False)
+        codes = series.cat.codes.to_numpy()
+        return (codes >= 0) & np.append(hit, False)[codes]
+    return series.astype(str).str.contains(query, case=False, regex=False).to_numpy()
+
+
+def select_rows(df, query="", sort_by=None, ascending=True):
+    """Positions of the rows matching ``query``, ordered by ``sort_by``.
+
+    ``query`` is a case-insensitive substring searched in the text columns.
+    TOTAL rows are never filtered out, and a sort moves them to the bottom.
+    """
+    rows = np.arange(len(df))
+    query = (query or "").strip()
+    if query:
+        keep = np.zeros(len(df), dtype=bool)
+        for col in df.select_dtypes(exclude=["number"]).columns:
+            keep |= _contains(df[col], query)
+        rows = rows[keep | total_mask(df)]
+
+    if sort_by is None:
+        return rows
+
+    values = df[sort_by].iloc[rows].reset_index(drop=True)
+    rows = rows[values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()]
+    return rows[np.argsort(total_mask(df)[rows], kind="stable")]
+
+
+def page_count(n_rows, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, -(-n_rows // page_size))
+
+
+def page_rows(rows, page, page_size=DEFAULT_PAGE_SIZE):
+    # ``page`` starts at 1, like the page number shown to the user
+    start = (page - 1) * page_size
+    return rows[start:start + page_size]
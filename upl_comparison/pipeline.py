@@ -0,0 +1,76 @@
+"""Bid & Price Analysis of a vendors x items price matrix (see matrix.PriceMatrix)."""
+import numpy as np
+import pandas as pd
+
+from upl_comparison.ranking import lowest_two
+
+VENDOR = "VENDOR"
+TOTAL = "TOTAL"
+
+# Index level marking the TOTAL rows of the Merge / Transpose views, so styling
+# and export never have to look for the word "TOTAL" in the cells
+IS_TOTAL = "is_total"
+
+SHEETS = ("Merge Data", "Transpose Data", "Bid & Price Analysis")
+
+
+def flag_totals(df, is_total):
+    # Row position + IS_TOTAL as index: Styler.apply needs a unique index
+    is_total = np.asarray(is_total, dtype=bool)
+    df.index = pd.MultiIndex.from_arrays([np.arange(len(df)), is_total], names=[None, IS_TOTAL])
+    return df
+
+
+def total_mask(df):
+    # Boolean array of the TOTAL rows; frames without the flag have none
+    if IS_TOTAL not in df.index.names:
+        return np.zeros(len(df), dtype=bool)
+    return df.index.get_level_values(IS_TOTAL).to_numpy(dtype=bool)
+
+
+def analyze_prices(prices, vendors, dtype=np.float64):
+    """Bid & Price Analysis columns for an (n_items, n_vendors) price matrix.
+
+    Everything comes from one sort of the rows with the non-bids (zero, NaN,
+    inf) pushed to the end as +inf: the two lowest bids are the first two
+    columns and the median sits in the middle of each row's bids. Pass
+    ``dtype=np.float32`` to halve the working memory on very large tenders.
+    """
+    prices = np.asarray(prices, dtype=dtype).reshape(len(prices), len(vendors))
+    n_items, n_vendors = prices.shape
+    rows = np.arange(n_items)
+
+    # Zero means the vendor did not bid
+    bid = np.isfinite(prices) & (prices != 0)
+    ordered = np.sort(np.where(bid, prices, np.inf), axis=1)
+    counts = bid.sum(axis=1)
+
+    lowest = np.full((n_items, 2), np.nan, dtype=dtype)
+    k = min(2, n_vendors)
+    lowest[:, :k] = np.where(np.isfinite(ordered[:, :k]), ordered[:, :k], np.nan)
+
+    median = np.full(n_items, np.nan, dtype=dtype)
+    if n_vendors:
+        middle = (ordered[rows, np.maximum(counts - 1, 0) // 2] + ordered[rows, counts // 2]) / 2
+        median = np.where(counts > 0, middle, np.nan).astype(dtype)
+
+    # Positions come from lowest_two so ties keep going to the leftmost vendor
+    ranks = lowest_two(prices)
+    names = np.array(list(vendors) + [""], dtype=object)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap = (lowest[:, 1] - lowest[:, 0]) / lowest[:, 0] * 100
+        to_median = (np.where(bid, prices, np.nan) - median[:, None]) / median[:, None] * 100
+
+    columns = {
+        "1st Lowest": lowest[:, 0],
+        "1st Vendor": names[ranks[:, 0]],
+        "2nd Lowest": lowest[:, 1],
+        "2nd Vendor": names[ranks[:, 1]],
+        "Gap 1 to 2 (%)": gap,
+        "Median Price": median,
+    }
+    for j, v in enumerate(vendors):
+        columns[f"{v} to Median (%)"] = to_median[:, j]
+
+    return pd.DataFrame(columns)
@@ -0,0 +1,53 @@
+"""1st / 2nd lowest vendor of every row, computed for the whole price matrix at once.
+
+A ranking is an ``(n_rows, 2)`` integer array holding, for every row, the
+column position (in the frame it was computed for) of the 1st and 2nd lowest
+price, or ``NO_RANK`` when the row has fewer bidders. The same array drives
+the Styler highlight, the Bid & Price Analysis columns and the xlsx writer.
+"""
+import numpy as np
+
+NO_RANK = -1
+
+
+def lowest_two(values):
+    # Zero means the vendor did not bid, so zero / NaN / inf never rank
+    values = np.asarray(values, dtype=float)
+    ranks = np.full((len(values), 2), NO_RANK, dtype=np.intp)
+    if values.ndim != 2 or values.shape[1] == 0:
+        return ranks
+
+    masked = np.where(np.isfinite(values) & (values != 0), values, np.inf)
+    rows = np.arange(len(masked))
+
+    # argmin keeps the leftmost vendor on ties, so the result is deterministic
+    for k in range(min(2, masked.shape[1])):
+        best = masked.argmin(axis=1)
+        found = np.isfinite(masked[rows, best])
+        ranks[found, k] = best[found]
+        masked[rows, best] = np.inf
+
+    return ranks
+
+
+def rank_columns(df, cols):
+    # Ranking of ``cols`` expressed as positions in df.columns
+    ranks = lowest_two(df[cols].to_numpy(dtype=float, na_value=np.nan))
+    col_pos = np.array([df.columns.get_loc(c) for c in cols] + [NO_RANK], dtype=np.intp)
+    return col_pos[ranks]
+
+
+def rank_from_names(df, first_col="1st Vendor", second_col="2nd Vendor"):
+    # Ranking stored as vendor names (Bid & Price Analysis), as df.columns positions
+    positions = {col: i for i, col in enumerate(df.columns)}
+    ranks = np.full((len(df), 2), NO_RANK, dtype=np.intp)
+    for k, name_col in enumerate((first_col, second_col)):
+        if name_col in df.columns:
+            ranks[:, k] = df[name_col].map(positions).fillna(NO_RANK).to_numpy(dtype=np.intp)
+    return ranks
+
+
+def rank_masks(ranks, n_cols):
+    # Boolean (n_rows, n_cols) masks of the 1st and 2nd lowest cells
+    cols = np.arange(n_cols)
+    return ranks[:, :1] == cols, ranks[:, 1:2] == cols
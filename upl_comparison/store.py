@@ -0,0 +1,269 @@
+"""Historical store: every compared tender kept in a local SQLite database.
+
+Prices and analysis results are stored per (tender, vendor, item) with
+indexes on the item description / category / UoM, the vendor and the tender
+date, so questions across many tenders ("median price of Optical Cable per M
+over the last 12 months", "Vendor B's win-rate trend") are answered from the
+database instead of re-parsing the workbooks.
+"""
+import datetime
+import json
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from upl_comparison.matching import normalize_text
+
+DEFAULT_PATH = "upl_history.sqlite"
+# Seconds a writer waits for another one (batch workers share the file)
+DEFAULT_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenders (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    tender_date TEXT NOT NULL,
+    content_hash TEXT UNIQUE,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tenders_date ON tenders (tender_date);
+
+CREATE TABLE IF NOT EXISTS vendors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    item_key TEXT NOT NULL UNIQUE,
+    description TEXT,
+    category TEXT,
+    uom TEXT
+);
+CREATE INDEX IF NOT EXISTS items_lookup ON items (description, uom, category);
+
+CREATE TABLE IF NOT EXISTS prices (
+    tender_id INTEGER NOT NULL REFERENCES tenders (id) ON DELETE CASCADE,
+    vendor_id INTEGER NOT NULL REFERENCES vendors (id),
+    item_id INTEGER NOT NULL REFERENCES items (id),
+    price REAL,
+    PRIMARY KEY (tender_id, vendor_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS prices_item ON prices (item_id, vendor_id);
+CREATE INDEX IF NOT EXISTS prices_vendor ON prices (vendor_id, tender_id);
+
+CREATE TABLE IF NOT EXISTS results (
+    tender_id INTEGER NOT NULL REFERENCES tenders (id) ON DELETE CASCADE,
+    item_id INTEGER NOT NULL REFERENCES items (id),
+    first_vendor_id INTEGER REFERENCES vendors (id),
+    second_vendor_id INTEGER REFERENCES vendors (id),
+    first_lowest REAL,
+    second_lowest REAL,
+    gap_pct REAL,
+    median_price REAL,
+    PRIMARY KEY (tender_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS results_first ON results (first_vendor_id, tender_id);
+CREATE INDEX IF NOT EXISTS results_second ON results (second_vendor_id, tender_id);
+"""
+
+# Indexed fields by position from the end of the item columns, as in the
+# guide's Desc -> Category -> UoM -> PRICE layout: names are free, so a
+# "Scope" column before them or "Item Description" as a header change nothing
+_FIELDS = {"description": -3, "category": -2, "uom": -1}
+
+
+def _date(value):
+    if value is None:
+        return None
+    return pd.Timestamp(value).date().isoformat()
+
+
+def _folded(value):
+    # Lookup value folded the way the stored items are
+    return None if value is None else normalize_text(pd.Series([value], dtype=object)).iat[0]
+
+
+def _item_rows(items):
+    # (item_key, description, category, uom) for every row of matrix.items,
+    # case- and whitespace-folded like the matching (upl_comparison.matching),
+    # so "Cross connect" and "cross  connect" are one stored item
+    folded = pd.DataFrame({col: normalize_text(items[col]) for col in items.columns})
+    folded = folded.astype(object).where(items.notna().to_numpy(), None)
+
+    n_cols = folded.shape[1]
+    if n_cols >= len(_FIELDS):
+        positions = {field: n_cols + pos for field, pos in _FIELDS.items()}
+    else:
+        # Fewer item columns: the first is the description, a second the UoM
+        positions = dict(zip(["description", "uom"], range(n_cols)))
+    fields = {
+        field: folded.iloc[:, positions[field]].tolist() if field in positions else [None] * len(items)
+        for field in _FIELDS
+    }
+
+    keys = [json.dumps(list(row)) for row in folded.itertuples(index=False, name=None)]
+    return list(zip(keys, fields["description"], fields["category"], fields["uom"]))
+
+
+class HistoryStore:
+    """SQLite-backed history of compared tenders."""
+
+    def __init__(self, path=DEFAULT_PATH, timeout=DEFAULT_TIMEOUT):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ===== WRITE =====
+    def _ids(self, table, column, values):
+        # id of every value, inserting the missing ones
+        values = list(values)
+        self._conn.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", [(v,) for v in set(values)])
+        found = {}
+        unique = list(set(values))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            found.update(self._conn.execute(f"SELECT {column}, id FROM {table} WHERE {column} IN ({marks})", chunk))
+        return np.array([found[v] for v in values], dtype=np.int64)
+
+    def save_tender(self, matrix, analysis, tender_date=None, name=None, content_hash=None):
+        """Store one tender (a PriceMatrix and its analysis); returns its id.
+
+        ``tender_date`` defaults to today. A tender saved again with the same
+        ``content_hash`` replaces the previous copy but keeps its tender date
+        (unless one is given) and creation time, so re-running a comparison
+        does not move the tender in the date-range queries.
+        """
+        tender_date = _date(tender_date)
+        created_at = datetime.datetime.now().isoformat(timespec="seconds")
+        item_rows = _item_rows(matrix.items)
+
+        with self._lock, self._conn:
+            if content_hash is not None:
+                previous = self._conn.execute(
+                    "SELECT tender_date, created_at FROM tenders WHERE content_hash = ?", (content_hash,)
+                ).fetchone()
+                if previous is not None:
+                    tender_date = tender_date or previous[0]
+                    created_at = previous[1]
+                self._conn.execute("DELETE FROM tenders WHERE content_hash = ?", (content_hash,))
+            tender_id = self._conn.execute(
+                "INSERT INTO tenders (name, tender_date, content_hash, created_at) VALUES (?, ?, ?, ?)",
+                (name, tender_date or _date(datetime.date.today()), content_hash, created_at),
+            ).lastrowid
+
+            vendor_ids = self._ids("vendors", "name", [str(v) for v in matrix.vendors])
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items (item_key, description, category, uom) VALUES (?, ?, ?, ?)", item_rows
+            )
+            item_ids = self._ids("items", "item_key", [row[0] for row in item_rows])
+
+            # Only the prices that exist (NaN = item not in that vendor's sheet)
+            v, i = np.nonzero(~np.isnan(matrix.prices))
+            self._conn.executemany(
+                "INSERT INTO prices VALUES (?, ?, ?, ?)",
+                zip([tender_id] * len(v), vendor_ids[v].tolist(), item_ids[i].tolist(), matrix.prices[v, i].tolist()),
+            )
+
+            by_name = dict(zip(map(str, matrix.vendors), vendor_ids.tolist()))
+
+            def vendor_id(name):
+                return by_name.get(name)
+
+            def number(values):
+                return [None if pd.isna(x) else float(x) for x in values]
+
+            self._conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                zip(
+                    [tender_id] * len(analysis),
+                    item_ids.tolist(),
+                    [vendor_id(n) for n in analysis["1st Vendor"]],
+                    [vendor_id(n) for n in analysis["2nd Vendor"]],
+                    number(analysis["1st Lowest"]),
+                    number(analysis["2nd Lowest"]),
+                    number(analysis["Gap 1 to 2 (%)"]),
+                    number(analysis["Median Price"]),
+                ),
+            )
+
+        return tender_id
+
+    # ===== READ =====
+    def _query(self, sql, params):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def price_history(self, description, uom=None, category=None, vendor=None, since=None, until=None):
+        """Every stored price of an item: tender_date, tender, vendor, price.
+
+        ``description``, ``uom`` and ``category`` match regardless of case and
+        spacing.
+        """
+        sql = """
+            SELECT t.tender_date, t.name AS tender, v.name AS vendor, p.price
+            FROM items i
+            JOIN prices p ON p.item_id = i.id
+            JOIN tenders t ON t.id = p.tender_id
+            JOIN vendors v ON v.id = p.vendor_id
+            WHERE i.description = ?
+        """
+        params = [_folded(description)]
+        for clause, value in (
+            ("i.uom = ?", _folded(uom)),
+            ("i.category = ?", _folded(category)),
+            ("v.name = ?", vendor),
+            ("t.tender_date >= ?", _date(since)),
+            ("t.tender_date <= ?", _date(until)),
+        ):
+            if value is not None:
+                sql += f" AND {clause}"
+                params.append(value)
+        return self._query(sql + " ORDER BY t.tender_date", params)
+
+    def median_price(self, description, uom=None, category=None, vendor=None, since=None, until=None):
+        # Zero means the vendor did not bid, same as in the analysis
+        prices = self.price_history(description, uom, category, vendor, since, until)["price"].to_numpy(dtype=float)
+        bids = prices[np.isfinite(prices) & (prices != 0)]
+        return float(np.median(bids)) if len(bids) else np.nan
+
+    def win_rate_trend(self, vendor, since=None, until=None):
+        """Per tender: items ranked, 1st / 2nd places of ``vendor`` and their rates."""
+        # Rates are over all ranked items of the tenders the vendor took part in
+        sql = """
+            SELECT t.tender_date, t.name AS tender,
+                   COUNT(r.first_vendor_id) AS items,
+                   COALESCE(SUM(r.first_vendor_id = v.id), 0) AS first,
+                   COALESCE(SUM(r.second_vendor_id = v.id), 0) AS second
+            FROM vendors v
+            JOIN tenders t ON t.id IN (SELECT tender_id FROM prices WHERE vendor_id = v.id)
+            JOIN results r ON r.tender_id = t.id
+            WHERE v.name = ?
+        """
+        params = [vendor]
+        if since is not None:
+            sql += " AND t.tender_date >= ?"
+            params.append(_date(since))
+        if until is not None:
+            sql += " AND t.tender_date <= ?"
+            params.append(_date(until))
+
+        trend = self._query(sql + " GROUP BY t.id ORDER BY t.tender_date", params)
+        items = trend["items"].where(trend["items"] > 0)
+        trend["1st Win Rate (%)"] = trend["first"] / items * 100
+        trend["2nd Win Rate (%)"] = trend["second"] / items * 100
+        return trend
@@ -0,0 +1,74 @@
+"""Styler builders for the Merge Data, Transpose Data and Bid & Price Analysis tables.
+
+Every function works on whatever slice of the table is being shown: TOTAL
+rows come from the ``is_total`` index level and the 1st / 2nd lowest cells
+from a precomputed ranking (see upl_comparison.ranking), never from the cell
+text.
+"""
+import numpy as np
+import pandas as pd
+
+from upl_comparison.formatting import rupiah_formatter
+from upl_comparison.pipeline import total_mask
+from upl_comparison.ranking import rank_masks
+
+TOTAL_STYLE = "font-weight: bold; background-color: #D9EAD3; color: #1A5E20;"
+BOLD_STYLE = "font-weight: bold;"
+RED_STYLE = "background-color: #FFE5E5; color: #D00000; font-weight: 700;"
+FIRST_STYLE = "background-color: #C6EFCE; color: #006100;"
+SECOND_STYLE = "background-color: #FFEB9C; color: #9C6500;"
+
+
+def total_row_styles(df, style):
+    styles = np.where(total_mask(df), style, "")
+    return pd.DataFrame(np.repeat(styles[:, None], df.shape[1], axis=1), index=df.index, columns=df.columns)
+
+
+def highlight_total(df):
+    return total_row_styles(df, TOTAL_STYLE)
+
+
+def highlight_bold(df):
+    return total_row_styles(df, BOLD_STYLE)
+
+
+def red_highlight(df):
+    return total_row_styles(df, RED_STYLE)
+
+
+def highlight_1st_2nd(df, ranks):
+    # One ranking for the whole table, no per-row sort
+    first, second = rank_masks(ranks, df.shape[1])
+    styles = np.where(first, FIRST_STYLE, np.where(second, SECOND_STYLE, ""))
+    return pd.DataFrame(styles, index=df.index, columns=df.columns)
+
+
+def style_merge(view):
+    price_col = view.columns[-1]
+    return (
+        view.style
+        .format({price_col: rupiah_formatter(view[price_col])})
+        .apply(highlight_total, axis=None)
+    )
+
+
+def style_transpose(view, vendors, ranks):
+    return (
+        view.style
+        .format({col: rupiah_formatter(view[col]) for col in vendors})
+        .apply(highlight_bold, axis=None)
+        .apply(highlight_1st_2nd, axis=None, ranks=ranks)
+    )
+
+
+def style_analysis(view, vendors, ranks):
+    format_dic = {col: rupiah_formatter(view[col]) for col in vendors + ["1st Lowest", "2nd Lowest", "Median Price"]}
+    format_dic["Gap 1 to 2 (%)"] = "{:.1f}%"
+    for v in vendors:
+        format_dic[f"{v} to Median (%)"] = "{:+.1f}%"
+
+    return (
+        view.style
+        .format(format_dic, na_rep="")
+        .apply(highlight_1st_2nd, axis=None, ranks=ranks)
+    )
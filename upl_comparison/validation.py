@@ -0,0 +1,190 @@
+"""Checks of the sheet constraints listed in the user guide.
+
+Runs right after parsing, before the merge: every rule is checked on all
+sheets at once and every violation is reported with its sheet and cell, so
+a bad workbook is rejected in one go instead of failing halfway through the
+comparison.
+"""
+import numpy as np
+import pandas as pd
+
+from upl_comparison.matching import normalize_text
+
+# Rules, in the order of the user guide
+STRUCTURE = "structure"
+NUMERIC_COLUMN = "numeric column"
+NO_COLUMN = "No column"
+FLOATING_TABLE = "floating table"
+TOTAL_ROW = "TOTAL row"
+EMPTY_TABLE = "empty table"
+
+COLUMNS = ["sheet", "cell", "rule", "message"]
+
+# Header names of a row-number column, after folding
+NO_NAMES = {"no", "no.", "nomor", "#"}
+# First-column texts of a manually added TOTAL row, after folding
+TOTAL_WORDS = {"total", "grand total", "sub total", "subtotal", "jumlah", "total harga"}
+
+
+class InvalidWorkbook(ValueError):
+    """Raised instead of comparing a workbook that breaks the sheet constraints."""
+
+    def __init__(self, violations):
+        self.violations = violations
+        super().__init__(f"{len(violations)} violation(s) of the sheet constraints, first: {violations['message'].iat[0]}")
+
+
+def column_letter(col):
+    letters = ""
+    col += 1
+    while col:
+        col, rest = divmod(col - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+
+def _cells(rows, cols):
+    # "B3"-style names of 0-based positions
+    return [f"{column_letter(c)}{r + 1}" for r, c in zip(rows, cols)]
+
+
+def _is_number(values):
+    # Element-wise: a real number (bools are not prices)
+    values = np.asarray(values, dtype=object)
+    return np.fromiter(
+        (isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_)) for v in values),
+        dtype=bool, count=len(values),
+    )
+
+
+def _stack(frames, width):
+    # Item columns of every sheet ``width`` wide as one categorical per
+    # position, plus the sheet index and the row inside the sheet
+    names = [name for name, df in frames.items() if df.shape[1] == width]
+    sheet = np.repeat(np.arange(len(names)), [len(frames[name]) for name in names])
+    row = np.concatenate([np.arange(len(frames[name])) for name in names]) if names else np.empty(0, dtype=int)
+    items = [pd.api.types.union_categoricals([_object_categorical(frames[name].iloc[:, k]) for name in names])
+             for k in range(width - 1)]
+    return names, sheet, row, items
+
+
+def _object_categorical(values):
+    # Categories of mixed sheets (numbers in one, text in another) must share a dtype
+    values = values.astype("category")
+    return pd.Categorical.from_codes(values.cat.codes, values.cat.categories.astype(object))
+
+
+def validate_tables(frames, layouts=None):
+    """Every violation of the sheet constraints, one row each: sheet, cell, rule, message.
+
+    ``frames`` and ``layouts`` are what ingest.read_vendor_tables returns;
+    without the layouts, positions are counted from A1 and the floating
+    table and non-numeric PRICE checks are skipped. An empty frame means
+    the workbook is fine.
+    """
+    layouts = layouts or {}
+    origin = {name: (layouts.get(name) or {}).get("origin", [0, 0]) for name in frames}
+    found = []
+
+    def report(sheet, rows, cols, rule, messages):
+        if len(rows):
+            messages = [messages] * len(rows) if isinstance(messages, str) else messages
+            found.append(pd.DataFrame({
+                "sheet": sheet, "cell": _cells(rows, cols), "rule": rule, "message": messages,
+                "_row": rows, "_col": cols,
+            }))
+
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    first_name, first = next(iter(frames.items()))
+    reference = [str(c) for c in first.columns]
+
+    # ===== STRUCTURE: same columns as the first sheet =====
+    for name, df in frames.items():
+        r0, c0 = origin[name]
+        columns = [str(c) for c in df.columns]
+        if len(df) == 0:
+            report(name, [r0], [c0], EMPTY_TABLE, "The table has a header but no rows below it.")
+        if columns == reference:
+            continue
+        if len(columns) != len(reference):
+            report(name, [r0], [c0], STRUCTURE,
+                   f"The table has {len(columns)} column(s), sheet '{first_name}' has {len(reference)}.")
+        else:
+            bad = [k for k, (a, b) in enumerate(zip(columns, reference)) if a != b]
+            report(name, [r0] * len(bad), [c0 + k for k in bad], STRUCTURE,
+                   [f"Column '{columns[k]}' is '{reference[k]}' in sheet '{first_name}'." for k in bad])
+
+    # ===== HEADERS: no "No" column =====
+    for name, df in frames.items():
+        r0, c0 = origin[name]
+        bad = [k for k, col in enumerate(df.columns) if str(col).strip().casefold() in NO_NAMES]
+        report(name, [r0] * len(bad), [c0 + k for k in bad], NO_COLUMN,
+               [f"Remove the '{df.columns[k]}' column: it is read as a second numeric column." for k in bad])
+
+    # ===== CELLS: all sheets of the same width in one pass =====
+    for width in sorted({df.shape[1] for df in frames.values()}):
+        names, sheet, row, items = _stack(frames, width)
+        n_sheets = len(names)
+        start_row = np.array([origin[name][0] for name in names], dtype=int)
+        start_col = np.array([origin[name][1] for name in names], dtype=int)
+
+        for k, values in enumerate(items):
+            codes = values.codes
+            present = codes >= 0
+
+            # Only the last column may be numeric
+            number = _is_number(values.categories)[codes] & present
+            n_number = np.bincount(sheet[number], minlength=n_sheets)
+            n_present = np.bincount(sheet[present], minlength=n_sheets)
+            for j in np.flatnonzero((n_number == n_present) & (n_present > 0)).tolist():
+                name = names[j]
+                col = frames[name].columns[k]
+                if str(col).strip().casefold() in NO_NAMES:
+                    continue  # already reported as a "No" column
+                report(name, [start_row[j]], [start_col[j] + k], NUMERIC_COLUMN,
+                       f"Column '{col}' holds only numbers; the numeric column must be the last one and the only one.")
+
+        # No manual TOTAL row: a total word as the only filled item cell (the
+        # first one, or the one after a "No" column left empty) and a PRICE,
+        # the shape of the rows the merge adds. An item really named "Total"
+        # has its other columns filled
+        if items:
+            folded = np.column_stack([normalize_text(pd.Series(values)).to_numpy() for values in items])
+            word = np.isin(folded, list(TOTAL_WORDS))
+            price = np.concatenate([frames[name].iloc[:, -1].to_numpy(dtype=float) for name in names])
+            total = ((folded != "").sum(axis=1) == 1) & word.any(axis=1) & ~np.isnan(price)
+            report(np.array(names, dtype=object)[sheet[total]],
+                   (start_row[sheet[total]] + 1 + row[total]).tolist(),
+                   (start_col[sheet[total]] + word[total].argmax(axis=1)).tolist(),
+                   TOTAL_ROW, "Remove this TOTAL row: totals are added during the merge.")
+
+    for name, df in frames.items():
+        layout = layouts.get(name)
+        if not layout:
+            continue
+        r0, c0 = origin[name]
+        price = df.columns[-1] if df.shape[1] else None
+
+        # ===== PRICE: numbers only =====
+        rows = [r0 + 1 + i for i in layout["non_numeric"]]
+        report(name, rows, [c0 + df.shape[1] - 1] * len(rows), NUMERIC_COLUMN,
+               f"'{price}' must be a number here (leave it empty or 0 if there is no bid).")
+
+        # ===== FLOATING TABLE: nothing above or left of the table =====
+        outside = np.array(layout["outside"], dtype=int).reshape(-1, 2)
+        report(name, outside[:, 0].tolist(), outside[:, 1].tolist(), FLOATING_TABLE,
+               "Cell outside the table: keep the cells above and to the left of the table empty "
+               "and put notes in a text box.")
+
+    if not found:
+        return pd.DataFrame(columns=COLUMNS)
+
+    # In workbook order: sheet, then row, then column
+    violations = pd.concat(found, ignore_index=True)
+    sheet_order = {name: i for i, name in enumerate(layouts or frames)}
+    for name in frames:
+        sheet_order.setdefault(name, len(sheet_order))
+    violations["_sheet"] = violations["sheet"].map(sheet_order)
+    violations = violations.sort_values(["_sheet", "_row", "_col"], kind="stable", ignore_index=True)
+    return violations[COLUMNS]